@@ -0,0 +1,183 @@
+import copy
+from typing import Dict, List, Optional, TypeVar
+
+from Constraint import Constraint
+
+V = TypeVar('V')  # variable type
+D = TypeVar('D')  # domain type
+
+
+# Global constraint: all its variables take different values. Besides the usual checks it
+# propagates during arc consistency, either with Regin's matching-based filtering or with
+# the cheaper bounds consistency over Hall intervals (integer values only)
+class AllDifferentConstraint(Constraint[V, D]):
+    __slots__ = ('bounds', 'matching')
+    pairwise = True
+    propagates = True
+    stateful = True
+
+    def __init__(self, variables: List[V], bounds: bool = False) -> None:
+        super().__init__(variables)
+        self.bounds = bounds
+        # matching found by the last propagation, reused as a starting point for the next one
+        self.matching: Dict[V, D] = {}
+
+    def satisfied(self, assignment: Dict[V, D]) -> bool:
+        values = [assignment[variable] for variable in self.variables if variable in assignment]
+        return len(values) == len(set(values))
+
+    def satisfied_by(self, variable: V, assignment: Dict[V, D]) -> bool:
+        value = assignment[variable]
+        for other in self.variables:
+            if other != variable and other in assignment and assignment[other] == value:
+                return False
+        return True
+
+    def explain(self, variable: V, assignment: Dict[V, D]) -> List[V]:
+        value = assignment[variable]
+        return [other for other in self.variables if other != variable and assignment.get(other) == value]
+
+    def fresh(self) -> 'AllDifferentConstraint[V, D]':
+        other = copy.copy(self)
+        other.matching = {}
+        return other
+
+    def propagate(self, csp, assignment: Dict[V, D]) -> Optional[List[V]]:
+        domains = {}
+        for variable in self.variables:
+            domains[variable] = [assignment[variable]] if variable in assignment else list(csp.domains[variable])
+        if self.bounds:
+            filtered = filter_bounds(domains)
+        else:
+            filtered = self.filter_matching(domains)
+        if filtered is None:
+            return None
+        changed = []
+        for variable in self.variables:
+            if variable not in assignment and len(filtered[variable]) != csp.domains.size(variable):
+                csp.restrict(variable, filtered[variable])
+                changed.append(variable)
+        return changed
+
+    # Regin: keep an edge (variable, value) only if it belongs to some maximum matching,
+    # i.e. it is matched, lies on an alternating cycle or on an even alternating path
+    # starting at a free value
+    def filter_matching(self, domains: Dict[V, List[D]]) -> Optional[Dict[V, List[D]]]:
+        match_var: Dict[V, D] = {}
+        match_val: Dict[D, V] = {}
+        for variable, value in self.matching.items():
+            if value in domains[variable] and value not in match_val:
+                match_var[variable] = value
+                match_val[value] = variable
+
+        def augment(variable: V, seen: set) -> bool:
+            for value in domains[variable]:
+                if value in seen:
+                    continue
+                seen.add(value)
+                if value not in match_val or augment(match_val[value], seen):
+                    match_var[variable] = value
+                    match_val[value] = variable
+                    return True
+            return False
+
+        for variable in self.variables:
+            if variable not in match_var and not augment(variable, set()):
+                return None
+        self.matching = match_var
+
+        # directed graph: variable -> its matched value, value -> the other variables containing it
+        graph: Dict[tuple, List[tuple]] = {}
+        for variable in self.variables:
+            graph[('var', variable)] = [('val', match_var[variable])]
+            for value in domains[variable]:
+                graph.setdefault(('val', value), [])
+                if value != match_var[variable]:
+                    graph[('val', value)].append(('var', variable))
+
+        # values reachable from a free value through alternating paths
+        reached = set()
+        stack = [node for node in graph if node[0] == 'val' and node[1] not in match_val]
+        while stack:
+            node = stack.pop()
+            if node in reached:
+                continue
+            reached.add(node)
+            stack.extend(graph[node])
+
+        component = strongly_connected_components(graph)
+        filtered = {}
+        for variable in self.variables:
+            node = ('var', variable)
+            filtered[variable] = [value for value in domains[variable]
+                                  if value == match_var[variable] or ('val', value) in reached
+                                  or component[('val', value)] == component[node]]
+        return filtered
+
+
+# Bounds consistency: a Hall interval [a, b] holds exactly b - a + 1 variables whose domains
+# lie inside it, so no other variable can take a value from it
+def filter_bounds(domains: Dict[V, List[int]]) -> Optional[Dict[V, List[int]]]:
+    changed = True
+    while changed:
+        changed = False
+        if any(not values for values in domains.values()):
+            return None
+        lows = {variable: min(values) for variable, values in domains.items()}
+        highs = {variable: max(values) for variable, values in domains.items()}
+        for a in sorted(set(lows.values())):
+            for b in sorted(set(highs.values())):
+                if b < a:
+                    continue
+                inside = [variable for variable in domains if a <= lows[variable] and highs[variable] <= b]
+                if len(inside) > b - a + 1:
+                    return None
+                if len(inside) < b - a + 1:
+                    continue
+                for variable in domains:
+                    if variable in inside:
+                        continue
+                    kept = [value for value in domains[variable] if not a <= value <= b]
+                    if len(kept) != len(domains[variable]):
+                        domains[variable] = kept
+                        changed = True
+                if changed:
+                    break
+            if changed:
+                break
+    return domains
+
+
+# Tarjan's algorithm, returns the component index of every node
+def strongly_connected_components(graph: Dict[tuple, List[tuple]]) -> Dict[tuple, int]:
+    index: Dict[tuple, int] = {}
+    low: Dict[tuple, int] = {}
+    component: Dict[tuple, int] = {}
+    stack: List[tuple] = []
+    on_stack = set()
+    count = 0
+
+    def visit(node: tuple) -> None:
+        nonlocal count
+        index[node] = low[node] = len(index)
+        stack.append(node)
+        on_stack.add(node)
+        for successor in graph[node]:
+            if successor not in index:
+                visit(successor)
+                low[node] = min(low[node], low[successor])
+            elif successor in on_stack:
+                low[node] = min(low[node], index[successor])
+        if low[node] == index[node]:
+            while True:
+                member = stack.pop()
+                on_stack.discard(member)
+                component[member] = count
+                if member == node:
+                    break
+            count += 1
+
+    for node in graph:
+        if node not in index:
+            visit(node)
+    return component
@@ -1,28 +1,73 @@
-import itertools
-from typing import List, Dict
+import os
+from typing import List, Dict, Iterator
 import numpy as np
 from CSP import CSP, Constraint, Problem, Grid
 from utils import all_equal
 
 
-def generate_possible(row: List[str]) -> list[str]:
-    base_option = ['0'] * int(len(row) / 2) + ['1'] * int(len(row) / 2)
-    possible_rows = list(set(list(itertools.permutations(base_option))))
-    for i in range(len(row)):
-        if row[i] != 'x':
-            possible_rows = [x for x in possible_rows if x[i] == row[i]]
+# Directory holding the per-n tables of valid rows, one row per line
+ROWS_CACHE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), '.binary_rows')
+_valid_rows: Dict[int, List[tuple[str, ...]]] = {}
 
-    res = possible_rows.copy()
 
-    for pos_row in possible_rows:
-        for i in range(2, len(pos_row)):
-            if pos_row[i] == pos_row[i - 1] == pos_row[i - 2]:
-                if pos_row in res:
-                    res.remove(pos_row)
-    return res
+def enumerate_valid_rows(n: int) -> Iterator[tuple[str, ...]]:
+    # yields balanced rows with no three identical digits next to each other,
+    # extending a prefix digit by digit so dead prefixes are cut off immediately
+    if n % 2:
+        return
+    half = n // 2
+    row: List[str] = []
+
+    def extend(zeros: int, ones: int) -> Iterator[tuple[str, ...]]:
+        if len(row) == n:
+            yield tuple(row)
+            return
+        for digit, count in (('0', zeros), ('1', ones)):
+            if count == half:
+                continue
+            if len(row) >= 2 and row[-1] == row[-2] == digit:
+                continue
+            row.append(digit)
+            if digit == '0':
+                yield from extend(zeros + 1, ones)
+            else:
+                yield from extend(zeros, ones + 1)
+            row.pop()
+
+    yield from extend(0, 0)
+
+
+def valid_rows(n: int) -> List[tuple[str, ...]]:
+    # table of valid rows for size n, computed once per process and persisted to disk
+    if n in _valid_rows:
+        return _valid_rows[n]
+    path = os.path.join(ROWS_CACHE_DIR, 'rows_' + str(n))
+    try:
+        with open(path, 'r') as file:
+            rows = [tuple(line) for line in file.read().splitlines()]
+    except OSError:
+        rows = list(enumerate_valid_rows(n))
+        try:
+            os.makedirs(ROWS_CACHE_DIR, exist_ok=True)
+            tmp_path = path + '.' + str(os.getpid())
+            with open(tmp_path, 'w') as file:
+                file.write('\n'.join(''.join(row) for row in rows))
+            os.replace(tmp_path, path)
+        except OSError:
+            # the table is only a cache, a read-only checkout still works
+            pass
+    _valid_rows[n] = rows
+    return rows
+
+
+def generate_possible(row: List[str]) -> list[tuple[str, ...]]:
+    givens = [(i, row[i]) for i in range(len(row)) if row[i] != 'x']
+    return [pos_row for pos_row in valid_rows(len(row)) if all(pos_row[i] == digit for i, digit in givens)]
 
 
 class BackwardConstraint(Constraint[int, str]):
+    __slots__ = ('rows',)
+
     def __init__(self, rows: List[int]) -> None:
         super().__init__(rows)
         self.rows: List[int] = rows
@@ -36,8 +81,22 @@ class BackwardConstraint(Constraint[int, str]):
                         return False
         return True
 
+    def satisfied_by(self, variable: int, assignment: Dict[int, tuple[str, ...]]) -> bool:
+        # only the triple this constraint anchors at the new row can have changed
+        if variable-1 in assignment and variable-2 in assignment:
+            for x, y, z in zip(assignment[variable], assignment[variable-1], assignment[variable-2]):
+                if x == y == z:
+                    return False
+        return True
+
+    def explain(self, variable: int, assignment: Dict[int, tuple[str, ...]]) -> List[int]:
+        # the two rows above complete the triple, they need not be in the scope of the constraint
+        return [variable-1, variable-2]
+
 
 class ForwardConstraint(Constraint[int, str]):
+    __slots__ = ('rows',)
+
     def __init__(self, rows: List[int]) -> None:
         super().__init__(rows)
         self.rows: List[int] = rows
@@ -51,8 +110,22 @@ class ForwardConstraint(Constraint[int, str]):
                         return False
         return True
 
+    def satisfied_by(self, variable: int, assignment: Dict[int, tuple[str, ...]]) -> bool:
+        # only the triple this constraint anchors at the new row can have changed
+        if variable+1 in assignment and variable+2 in assignment:
+            for x, y, z in zip(assignment[variable], assignment[variable+1], assignment[variable+2]):
+                if x == y == z:
+                    return False
+        return True
+
+    def explain(self, variable: int, assignment: Dict[int, tuple[str, ...]]) -> List[int]:
+        # the two rows below complete the triple, they need not be in the scope of the constraint
+        return [variable+1, variable+2]
+
 
 class MiddleConstraint(Constraint[int, str]):
+    __slots__ = ('rows',)
+
     def __init__(self, rows: List[int]) -> None:
         super().__init__(rows)
         self.rows: List[int] = rows
@@ -66,8 +139,22 @@ class MiddleConstraint(Constraint[int, str]):
                         return False
         return True
 
+    def satisfied_by(self, variable: int, assignment: Dict[int, tuple[str, ...]]) -> bool:
+        # only the triple this constraint anchors at the new row can have changed
+        if variable-1 in assignment and variable+1 in assignment:
+            for x, y, z in zip(assignment[variable], assignment[variable-1], assignment[variable+1]):
+                if x == y == z:
+                    return False
+        return True
+
+    def explain(self, variable: int, assignment: Dict[int, tuple[str, ...]]) -> List[int]:
+        # the rows above and below complete the triple, they need not be in the scope of the constraint
+        return [variable-1, variable+1]
+
 
 class ZerosAndOnesConstraint(Constraint[int, str]):
+    __slots__ = ('rows',)
+
     def __init__(self, rows: List[int]) -> None:
         super().__init__(rows)
         self.rows: List[int] = rows
@@ -90,8 +177,16 @@ class ZerosAndOnesConstraint(Constraint[int, str]):
                 return False
         return True
 
+    def satisfied_by(self, variable: int, assignment: Dict[int, tuple[str, ...]]) -> bool:
+        # columns can only be counted once every row is placed
+        if len(assignment) != len(assignment[variable]):
+            return True
+        return self.satisfied(assignment)
+
 
 class UniqueConstraint(Constraint[int, str]):
+    __slots__ = ('rows',)
+
     def __init__(self, rows: List[int]) -> None:
         super().__init__(rows)
         self.rows: List[int] = rows
@@ -115,15 +210,22 @@ class UniqueConstraint(Constraint[int, str]):
                 return False
         return True
 
+    def satisfied_by(self, variable: int, assignment: Dict[int, tuple[str, ...]]) -> bool:
+        # the new row must differ from every other placed row
+        value = assignment[variable]
+        for row_idx in assignment:
+            if row_idx != variable and assignment[row_idx] == value:
+                return False
+        # columns can only be compared once every row is placed
+        if len(assignment) == len(value):
+            columns = list(zip(*(assignment[row_idx] for row_idx in assignment)))
+            if len(set(columns)) != len(columns):
+                return False
+        return True
+
 
 # Base class for all problems
 class Binary(Problem):
-    # Solutions for problem
-    def __init__(self, MRV, LSC) -> None:
-        super().__init__()
-        self.MRV = MRV
-        self.LSC = LSC
-
     @staticmethod
     def generate_domains(grid: Grid) -> dict[int, list[str]]:
         domains = {}
@@ -131,22 +233,28 @@ class Binary(Problem):
             domains[i] = generate_possible(grid[i])
         return domains
 
-    def solve(self, n: int, grid: Grid, to_first_solution: bool, forward_checking: bool) -> None:
+    # Rows start out with every valid row, the givens of a grid narrow their domains
+    def compile(self, n: int) -> CSP:
         rows: List[int] = list(range(n))
-        domains = self.generate_domains(grid)
+        domains = {row: valid_rows(n) for row in rows}
 
-        csp: CSP[int, str] = CSP(rows, domains)
+        csp: CSP[int, str] = CSP(rows, domains, bitset=self.bitset)
         csp.add_constraint(UniqueConstraint(rows))
         csp.add_constraint(ZerosAndOnesConstraint(rows))
         csp.add_constraint(MiddleConstraint(rows[1:-1]))
         csp.add_constraint(BackwardConstraint(rows[2:]))
         csp.add_constraint(ForwardConstraint(rows[:-2]))
+        return csp
 
-        if forward_checking:
-            csp.forward_checking_search(to_first_solution=to_first_solution, MRV=self.MRV,
-                                        LSC=self.LSC)
-        else:
-            csp.backtracking_search(to_first_solution=to_first_solution, MRV=self.MRV, LSC=self.LSC)
+    def bind(self, csp: CSP, grid: Grid) -> dict:
+        for row, domain in self.generate_domains(grid).items():
+            csp.domains[row] = domain
+            csp.domains_copy[row] = domain
+        return {}
+
+    def solve(self, n: int, grid: Grid, to_first_solution: bool, forward_checking: bool) -> None:
+        csp, start_assignment = self.build(n, grid)
+        self.search(csp, start_assignment, to_first_solution, forward_checking)
 
         self.solutions = csp.solutions
         if csp.solutions:
@@ -1,30 +1,38 @@
+import copy
 import itertools
-from typing import List, Dict
+from typing import List, Dict, Optional, Set
 from CSP import CSP, Constraint, Problem, Grid
-from utils import all_unique
 
 
-class BinaryConstraint(Constraint[tuple[int, int], int]):
-    def __init__(self, left: tuple[int, int], middle: tuple[int, int], right: tuple[int, int]) -> None:
+class BinaryConstraint(Constraint[int, int]):
+    __slots__ = ('left', 'middle', 'right')
+
+    def __init__(self, left: int, middle: int, right: int) -> None:
         super().__init__([left, middle, right])
-        self.left: tuple[int, int] = left
-        self.middle: tuple[int, int] = middle
-        self.right: tuple[int, int] = right
+        self.left: int = left
+        self.middle: int = middle
+        self.right: int = right
 
-    def satisfied(self, assignment: Dict[tuple[int, int], List[int]]) -> bool:
+    def satisfied(self, assignment: Dict[int, List[int]]) -> bool:
         # check if left == middle == right
         if self.left in assignment and self.middle in assignment and self.right in assignment:
             if assignment[self.left] == assignment[self.middle] == assignment[self.right]:
                 return False
         return True
 
+    def satisfied_by(self, variable: int, assignment: Dict[int, int]) -> bool:
+        # the full check only looks at the three fields already
+        return self.satisfied(assignment)
+
 
-class ZerosEqualsOnesConstraint(Constraint[tuple[int, int], int]):
-    def __init__(self, line: List[tuple[int, int]]) -> None:
+class ZerosEqualsOnesConstraint(Constraint[int, int]):
+    __slots__ = ('line',)
+
+    def __init__(self, line: List[int]) -> None:
         super().__init__(line)
-        self.line: List[tuple[int, int]] = line
+        self.line: List[int] = line
 
-    def satisfied(self, assignment: Dict[tuple[int, int], List[int]]) -> bool:
+    def satisfied(self, assignment: Dict[int, List[int]]) -> bool:
         # check if number of zeros equals number of ones
         if all(elem in assignment for elem in self.line):
             zero_count, one_count = 0, 0
@@ -37,48 +45,108 @@ class ZerosEqualsOnesConstraint(Constraint[tuple[int, int], int]):
                 return False
         return True
 
+    def satisfied_by(self, variable: int, assignment: Dict[int, int]) -> bool:
+        # the full check only looks at the line already
+        return self.satisfied(assignment)
+
 
-class ColumnConstraint(Constraint[tuple[int, int], int]):
-    def __init__(self, fields: List[tuple[int, int]], n: int, columns: List[List[tuple[int, int]]]) -> None:
+# Every complete line (row or column) differs from the others. The lines completed so far
+# are kept in a hash map from their values, so the check runs only once the last cell of
+# a line is assigned and costs one lookup. Entries are checked again before use and
+# dropped once their line was taken back, which keeps the map valid across backtracking
+# without hooks in the search; it is rebuilt when a different assignment comes in
+class UniqueLinesConstraint(Constraint[int, int]):
+    __slots__ = ('fields', 'n', 'lines', 'completed', 'tracked')
+    stateful = True
+
+    def __init__(self, fields: List[int], n: int, lines: List[List[int]]) -> None:
         super().__init__(fields)
-        self.fields: List[tuple[int, int]] = fields
+        self.fields: List[int] = fields
         self.n = n
-        self.columns = columns
+        self.lines = lines
         self.fields.sort()
+        self.completed: Dict[tuple[int, ...], Set[int]] = {}
+        self.tracked: Optional[Dict[int, int]] = None
+
+    # Line of a field, the row by default
+    def line(self, variable: int) -> int:
+        return variable // self.n
+
+    # Values of line k, None while it is not complete
+    def line_values(self, k: int, assignment: Dict[int, int]) -> Optional[tuple[int, ...]]:
+        values = []
+        for field in self.lines[k]:
+            if field not in assignment:
+                return None
+            values.append(assignment[field])
+        return tuple(values)
+
+    def satisfied(self, assignment: Dict[int, List[int]]) -> bool:
+        # check if every complete line is unique
+        lines = [values for values in (self.line_values(k, assignment) for k in range(len(self.lines)))
+                 if values is not None]
+        return len(set(lines)) == len(lines)
+
+    def satisfied_by(self, variable: int, assignment: Dict[int, int]) -> bool:
+        # only the line of the new field can have become a duplicate
+        k = self.line(variable)
+        values = self.line_values(k, assignment)
+        if values is None:
+            return True
+        if assignment is not self.tracked:
+            self.track(assignment)
+        lines = self.completed.setdefault(values, set())
+        for other in list(lines):
+            if other != k:
+                if self.line_values(other, assignment) == values:
+                    return False
+                lines.discard(other)
+        lines.add(k)
+        return True
 
-    def satisfied(self, assignment: Dict[tuple[int, int], List[int]]) -> bool:
-        # check if every column is unique
-        keys = assignment.keys()
-        lines = []
-        for column in self.columns:
-            if all(elem in keys for elem in column):
-                line = [assignment[x] for x in column]
-                lines.append(line)
+    def explain(self, variable: int, assignment: Dict[int, int]) -> List[int]:
+        # the line of the field and the complete lines equal to it
+        k = self.line(variable)
+        values = self.line_values(k, assignment)
+        involved = [x for x in self.lines[k] if x != variable]
+        for other in range(len(self.lines)):
+            if other != k and self.line_values(other, assignment) == values:
+                involved.extend(self.lines[other])
+        return involved
+
+    def fresh(self) -> 'UniqueLinesConstraint':
+        other = copy.copy(self)
+        other.completed = {}
+        other.tracked = None
+        return other
+
+    # Start over from the complete lines of another assignment
+    def track(self, assignment: Dict[int, int]) -> None:
+        self.tracked = assignment
+        self.completed = {}
+        for k in range(len(self.lines)):
+            values = self.line_values(k, assignment)
+            if values is not None:
+                self.completed.setdefault(values, set()).add(k)
+
+
+class ColumnConstraint(UniqueLinesConstraint):
+    __slots__ = ('columns',)
+
+    def __init__(self, fields: List[int], n: int, columns: List[List[int]]) -> None:
+        super().__init__(fields, n, columns)
+        self.columns = columns
 
-        if not all_unique(lines):
-            return False
-        return True
+    def line(self, variable: int) -> int:
+        return variable % self.n
 
 
-class RowConstraint(Constraint[tuple[int, int], int]):
-    def __init__(self, fields: List[tuple[int, int]], n: int, rows: List[List[tuple[int, int]]]) -> None:
-        super().__init__(fields)
-        self.fields: List[tuple[int, int]] = fields
-        self.n = n
-        self.rows = rows
-        self.fields.sort()
+class RowConstraint(UniqueLinesConstraint):
+    __slots__ = ('rows',)
 
-    def satisfied(self, assignment: Dict[tuple[int, int], List[int]]):
-        # check if every row is unique
-        keys = assignment.keys()
-        lines = []
-        for row in self.rows:
-            if all(elem in keys for elem in row):
-                line = [assignment[x] for x in row]
-                lines.append(line)
-        if not all_unique(lines):
-            return False
-        return True
+    def __init__(self, fields: List[int], n: int, rows: List[List[int]]) -> None:
+        super().__init__(fields, n, rows)
+        self.rows = rows
 
 
 def generate_lines(n: int):
@@ -87,80 +155,80 @@ def generate_lines(n: int):
         row = []
         column = []
         for j in range(n):
-            row.append((i, j))
-            column.append((j, i))
+            row.append(i * n + j)
+            column.append(j * n + i)
         rows.append(row)
         columns.append(column)
     return rows, columns
 
 
+# Fields are numbered row by row, field (i, j) is variable i * n + j; solutions are
+# given back with (i, j) keys
 class Binary2(Problem):
-    # Solutions for problem
-    def __init__(self, MRV, LSC) -> None:
-        super().__init__()
-        self.MRV = MRV
-        self.LSC = LSC
-
     @staticmethod
-    def generate_domains(n: int) -> dict[(int, int), list[int]]:
+    def generate_domains(n: int) -> dict[int, list[int]]:
         domains = {}
         for i in range(n):
             for j in range(n):
-                domains[(i, j)] = [0, 1]
+                domains[i * n + j] = [0, 1]
         return domains
 
     @staticmethod
     def find_start_assignment(grid):
+        n = len(grid)
         assignment = {}
         for i in range(len(grid)):
             for j in range(len(grid[i])):
                 if grid[i][j] != 'x':
-                    assignment[(i, j)] = int(grid[i][j])
+                    assignment[i * n + j] = int(grid[i][j])
         return assignment
 
     @staticmethod
-    def define_binary_constraints(grid: Grid, csp: CSP) -> None:
-        for i in range(len(grid)):
-            for j in range(len(grid) - 2):
-                csp.add_constraint(BinaryConstraint((i, j), (i, j + 1), (i, j + 2)))
-        for i in range(len(grid) - 2):
-            for j in range(len(grid)):
-                csp.add_constraint(BinaryConstraint((i, j), (i + 1, j), (i + 2, j)))
+    def define_binary_constraints(n: int, csp: CSP) -> None:
+        for i in range(n):
+            for j in range(n - 2):
+                csp.add_constraint(BinaryConstraint(i * n + j, i * n + j + 1, i * n + j + 2))
+        for i in range(n - 2):
+            for j in range(n):
+                csp.add_constraint(BinaryConstraint(i * n + j, (i + 1) * n + j, (i + 2) * n + j))
         return
 
     @staticmethod
-    def define__zeros_equals_ones_constraints(grid: Grid, csp: CSP) -> None:
+    def define__zeros_equals_ones_constraints(n: int, csp: CSP) -> None:
         lines = []
-        for i in range(len(grid)):
+        for i in range(n):
             line = []
             line2 = []
-            for j in range(len(grid)):
-                line.append((i, j))
-                line2.append((j, i))
+            for j in range(n):
+                line.append(i * n + j)
+                line2.append(j * n + i)
             lines.append(line)
             lines.append(line2)
         for line in lines:
             csp.add_constraint(ZerosEqualsOnesConstraint(line))
         return
 
-    def solve(self, n: int, grid: Grid, to_first_solution: bool, forward_checking: bool):
-        variables: List[tuple[int, int]] = list(itertools.product(list(range(n)), list(range(n))))
+    # Every constraint is the same for all grids of a size, only the givens are bound per grid
+    def compile(self, n: int) -> CSP:
+        variables: List[int] = list(range(n * n))
         domains = self.generate_domains(n)
-        csp: CSP[tuple[int, int], int] = CSP(variables, domains)
+        csp: CSP[int, int] = CSP(variables, domains, bitset=self.bitset,
+                                 labels=list(itertools.product(range(n), range(n))))
 
-        self.define_binary_constraints(grid, csp)
-        self.define__zeros_equals_ones_constraints(grid, csp)
+        self.define_binary_constraints(n, csp)
+        self.define__zeros_equals_ones_constraints(n, csp)
 
         rows, columns = generate_lines(n)
         csp.add_constraint(RowConstraint(variables, n, rows))
         csp.add_constraint(ColumnConstraint(variables, n, columns))
-        start_assignment = self.find_start_assignment(grid)
+        return csp
 
-        if forward_checking:
-            csp.forward_checking_search(start_assignment, to_first_solution=to_first_solution, MRV=self.MRV,
-                                        LSC=self.LSC)
-        else:
-            csp.backtracking_search(start_assignment, to_first_solution=to_first_solution, MRV=self.MRV, LSC=self.LSC)
+    def bind(self, csp: CSP, grid: Grid) -> dict:
+        return self.find_start_assignment(grid)
+
+    def solve(self, n: int, grid: Grid, to_first_solution: bool, forward_checking: bool):
+        csp, start_assignment = self.build(n, grid)
+        self.search(csp, start_assignment, to_first_solution, forward_checking)
 
         self.solutions = csp.solutions
         first = 0
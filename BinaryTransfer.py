@@ -0,0 +1,114 @@
+from typing import Dict, Iterator, List, Optional
+
+from CSP import Grid
+from Binary import valid_rows
+
+# bits per column in the packed column counters; a counter above half overflows into
+# the top bit of its field once the bias is added
+FIELD = 5
+
+
+# Row i of a grid as an int, bit j set when cell j is '1'
+def row_code(row) -> int:
+    return sum(1 << j for j, cell in enumerate(row) if cell == '1')
+
+
+# Dynamic programming over the rows of a Binary grid, the transfer-matrix way: the state
+# after placing a row is (the last two rows, the number of ones in every column), which is
+# all the remaining rows depend on except uniqueness. completions() counts the ways to
+# finish a state with no vertical triple, balanced columns and no row repeating one of the
+# two rows above it, the part of uniqueness the state can check; tables of the rows that
+# can follow a pair of rows are built per row id on first use. Exact solutions also need
+# every row and column unique: iter_solutions walks only into states with completions left
+# and checks those, so its work grows with the solutions of the relaxation, not with the
+# search tree of the CSP
+class TransferBinary:
+    def __init__(self, n: int, grid: Grid) -> None:
+        self.n = n
+        half = n // 2
+        self.full = (1 << n) - 1
+        codes = [row_code(row) for row in valid_rows(n)]
+        # candidate rows of every row id, as codes that agree with the givens
+        self.candidates: List[List[int]] = []
+        for line in grid:
+            mask = sum(1 << j for j, cell in enumerate(line) if cell != 'x')
+            value = row_code(line)
+            self.candidates.append([code for code in codes if code & mask == value])
+        # ones of a row spread into the column counters
+        self.spread = {code: sum(1 << (FIELD * j) for j in range(n) if code >> j & 1) for code in codes}
+        self.unit = sum(1 << (FIELD * j) for j in range(n))
+        self.bias = (2 ** (FIELD - 1) - 1 - half) * self.unit
+        self.carry = (1 << (FIELD - 1)) * self.unit
+        # (row id, row two above, row above) -> candidates with no vertical triple
+        self.tables: Dict[tuple, List[int]] = {}
+        self.memo: Dict[tuple, int] = {}
+
+    # Candidates of row i that differ from rows a and b above it and, where a and b agree,
+    # from their value
+    def compatible(self, i: int, a: Optional[int], b: Optional[int]) -> List[int]:
+        key = (i, a, b)
+        table = self.tables.get(key)
+        if table is None:
+            if a is None:
+                table = [c for c in self.candidates[i] if c != b]
+            else:
+                equal = ~(a ^ b) & self.full
+                table = [c for c in self.candidates[i] if c != a and c != b and (c ^ a) & equal == equal]
+            self.tables[key] = table
+        return table
+
+    # No column has more than half ones or more than half zeros after rows rows
+    def balanced(self, rows: int, ones: int) -> bool:
+        zeros = rows * self.unit - ones
+        return (ones + self.bias) & self.carry == 0 and (zeros + self.bias) & self.carry == 0
+
+    # Ways to fill rows i.. after rows a, b with the column counters ones, uniqueness aside
+    def completions(self, i: int, a: Optional[int], b: Optional[int], ones: int) -> int:
+        if i == self.n:
+            return 1
+        key = (i, a, b, ones)
+        total = self.memo.get(key)
+        if total is None:
+            total = 0
+            for c in self.compatible(i, a, b):
+                after = ones + self.spread[c]
+                if self.balanced(i + 1, after):
+                    total += self.completions(i + 1, b, c, after)
+            self.memo[key] = total
+        return total
+
+    # Number of grids with no vertical triple, balanced columns and no row equal to one of the
+    # two rows above it; rows further apart and columns may repeat. An upper bound on the
+    # number of solutions
+    def count_relaxed(self) -> int:
+        return self.completions(0, None, None, 0)
+
+    # Yield the solutions in the form of Binary: row -> tuple of '0'/'1'
+    def iter_solutions(self, limit: Optional[int] = None) -> Iterator[Dict[int, tuple[str, ...]]]:
+        n = self.n
+        rows: List[int] = []
+        found = 0
+
+        def extend(i: int, a: Optional[int], b: Optional[int], ones: int):
+            nonlocal found
+            if i == n:
+                columns = {sum((code >> j & 1) << k for k, code in enumerate(rows)) for j in range(n)}
+                if len(columns) == n:
+                    found += 1
+                    yield {k: tuple('1' if code >> j & 1 else '0' for j in range(n)) for k, code in enumerate(rows)}
+                return
+            for c in self.compatible(i, a, b):
+                after = ones + self.spread[c]
+                if c in rows or not self.balanced(i + 1, after) or not self.completions(i + 1, b, c, after):
+                    continue
+                rows.append(c)
+                yield from extend(i + 1, b, c, after)
+                rows.pop()
+                if found == limit:
+                    return
+
+        if limit is None or limit > 0:
+            yield from extend(0, None, None, 0)
+
+    def count_solutions(self, limit: Optional[int] = None) -> int:
+        return sum(1 for _ in self.iter_solutions(limit))
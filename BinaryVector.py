@@ -0,0 +1,130 @@
+from typing import Dict, Iterator, Optional
+
+import numpy as np
+
+from CSP import Grid
+from Binary import valid_rows
+
+# neighbouring rows (a, b) that form a vertical triple with a row j as (j + a, j + b)
+TRIPLES = ((-2, -1), (-1, 1), (1, 2))
+
+
+# Valid rows of size n as a uint8 matrix, one row per line
+def row_matrix(n: int) -> np.ndarray:
+    rows = valid_rows(n)
+    if not rows:
+        return np.zeros((0, n), dtype=np.uint8)
+    return np.array(rows).astype(np.uint8)
+
+
+# Forward checking search on the row model of Binary with every domain held as a matrix
+# of candidate rows. The candidates of all unplaced rows are kept together in one matrix
+# with the row each belongs to, so one forward-check step filters all of them in a single
+# batch of array operations: no repeated row, no vertical triple with two placed
+# neighbours, column counts that can still end balanced and, when a single row is left,
+# columns that come out unique. Rows are picked by minimum remaining values with MRV.
+# Solutions have the same form as the ones of Binary: row -> tuple of '0'/'1'
+class VectorBinary:
+    def __init__(self, MRV=True) -> None:
+        self.MRV = MRV
+        self.nodes_visited = 0
+        self.solutions = []
+
+    # Candidate rows of every row of the grid that agree with its givens
+    @staticmethod
+    def candidates(n: int, grid: Grid) -> tuple[np.ndarray, np.ndarray]:
+        rows = row_matrix(n)
+        matrices, owners = [], []
+        for i, line in enumerate(grid):
+            keep = np.ones(len(rows), dtype=bool)
+            for j, cell in enumerate(line):
+                if cell != 'x':
+                    keep &= rows[:, j] == int(cell)
+            matrices.append(rows[keep])
+            owners.append(np.full(int(keep.sum()), i, dtype=np.intp))
+        return np.concatenate(matrices), np.concatenate(owners)
+
+    # Yield the solutions of a grid one by one as they are found
+    def iter_solutions(self, n: int, grid: Grid, limit: Optional[int] = None) -> Iterator[Dict[int, tuple[str, ...]]]:
+        self.nodes_visited = 0
+        cands, owner = self.candidates(n, grid)
+        # placed rows padded with two empty rows on each side, row i at index i + 2
+        placed_rows = np.zeros((n + 4, n), dtype=np.uint8)
+        placed = np.zeros(n + 4, dtype=bool)
+        ones = np.zeros(n, dtype=np.intp)
+        if limit is not None and limit <= 0:
+            return
+        for count, solution in enumerate(self.search(n, cands, owner, placed_rows, placed, ones), 1):
+            yield solution
+            if count == limit:
+                return
+
+    # Count the solutions of a grid; returns the number of solutions, the nodes visited
+    # until the first one and in total
+    def count_solutions(self, n: int, grid: Grid, limit: Optional[int] = None) -> tuple[int, int, int]:
+        count, first = 0, 0
+        for _ in self.iter_solutions(n, grid, limit):
+            count += 1
+            if count == 1:
+                first = self.nodes_visited
+        return count, first, self.nodes_visited
+
+    def search(self, n: int, cands: np.ndarray, owner: np.ndarray, placed_rows: np.ndarray, placed: np.ndarray,
+               ones: np.ndarray) -> Iterator[Dict[int, tuple[str, ...]]]:
+        open_rows = np.flatnonzero(~placed[2:-2])
+        if len(open_rows) == 0:
+            yield {i: tuple('01'[x] for x in placed_rows[i + 2]) for i in range(n)}
+            return
+        if self.MRV:
+            sizes = np.bincount(owner, minlength=n)[open_rows]
+            row = int(open_rows[np.argmin(sizes)])
+        else:
+            row = int(open_rows[0])
+        mine = owner == row
+        values, rest, rest_owner = cands[mine], cands[~mine], owner[~mine]
+
+        for value in values:
+            self.nodes_visited += 1
+            placed_rows[row + 2] = value
+            placed[row + 2] = True
+            keep = self.forward_check(n, rest, rest_owner, value, placed_rows, placed, ones + value)
+            survivors = rest_owner[keep]
+            if np.all(np.bincount(survivors, minlength=n)[~placed[2:-2]] > 0):
+                yield from self.search(n, rest[keep], survivors, placed_rows, placed, ones + value)
+            placed[row + 2] = False
+
+    # Mask of the candidates still consistent after value was placed; placed_rows and
+    # placed are padded as in iter_solutions
+    @staticmethod
+    def forward_check(n: int, cands: np.ndarray, owner: np.ndarray, value: np.ndarray, placed_rows: np.ndarray,
+                      placed: np.ndarray, ones: np.ndarray) -> np.ndarray:
+        half = n // 2
+        # rows are unique
+        keep = (cands != value).any(axis=1)
+        # column counts can still end with half zeros and half ones
+        count = int(placed.sum())
+        zeros = count - ones
+        keep &= ((ones + cands) <= half).all(axis=1) & ((zeros + 1 - cands) <= half).all(axis=1)
+        # no three equal cells in a column: where two placed neighbours agree the candidate must differ
+        index = owner + 2
+        for a, b in TRIPLES:
+            first, second = placed_rows[index + a], placed_rows[index + b]
+            both = (placed[index + a] & placed[index + b])[:, None]
+            keep &= ~(both & (first == second) & (cands == first)).any(axis=1)
+        # with one row left its candidates complete every column, which must all differ
+        if count == n - 1:
+            shifts = np.arange(n, dtype=np.int64)[:, None]
+            codes = (placed_rows[2:-2].astype(np.int64) << shifts)[placed[2:-2]].sum(axis=0)
+            codes = np.sort(codes + (cands.astype(np.int64) << owner.astype(np.int64)[:, None]), axis=1)
+            keep &= (np.diff(codes, axis=1) != 0).all(axis=1)
+        return keep
+
+    def solve(self, n: int, grid: Grid, to_first_solution: bool) -> None:
+        self.solutions = []
+        for solution in self.iter_solutions(n, grid, 1 if to_first_solution else None):
+            self.solutions.append((solution, self.nodes_visited))
+            print('Visited nodes: ' + str(self.nodes_visited))
+        if self.solutions:
+            print('All visited nodes: ' + str(self.nodes_visited))
+        else:
+            print("No solution found!")
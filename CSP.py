@@ -1,35 +1,188 @@
 import copy
-from typing import Generic, TypeVar, Dict, List, Optional, Any
+import itertools
+import random
+import time
+from collections import deque
+from typing import Generic, TypeVar, Dict, List, Optional, Any, Iterator
 from abc import ABC, abstractmethod
 
 from Constraint import Constraint
+from Domains import ListDomains, BitsetDomains
+from Engine import IterativeSearch
+from Nogoods import NogoodStore
+from Ordering import ORDERINGS, VariableOrdering
+from Stats import SearchStats
+from Templates import TemplateCache
 
 V = TypeVar('V')  # variable type
 D = TypeVar('D')  # domain type
 Grid = List[List[str]]  # type alias for grids
 
+# Constraints over at most this many variables get full support checks during
+# arc consistency, larger ones are only checked against the assigned variables
+MAX_SUPPORT_ARITY = 3
+
+# Nodes between two looks at the clock and the cancel token of a limited search
+LIMIT_CHECK_INTERVAL = 256
+
+
+# Raised inside a search when one of its limits is reached: 'nodes', 'deadline' or 'cancelled'
+class LimitReached(Exception):
+    def __init__(self, reason: str = 'nodes') -> None:
+        super().__init__(reason)
+        self.reason = reason
+
+
+# Outcome of a search: the solutions found with the nodes visited until each, the nodes
+# visited and the seconds spent in total, the limit that stopped the search (None when
+# it ran to the end) and its statistics when they were enabled
+class SearchResult:
+    def __init__(self, solutions: list, nodes_visited: int, elapsed: float, limit: Optional[str] = None,
+                 stats: Optional[SearchStats] = None) -> None:
+        self.solutions = solutions
+        self.nodes_visited = nodes_visited
+        self.elapsed = elapsed
+        self.limit = limit
+        self.stats = stats
+
+    @property
+    def limit_reached(self) -> bool:
+        return self.limit is not None
+
 
 # Base class for all problems
 class Problem(ABC):
-    # Solutions for problem
-    def __init__(self) -> None:
+    # compiled models shared by all problems, see template()
+    templates = TemplateCache()
+
+    # Solutions for problem and the search options used to find them
+    # ordering names a variable ordering from Ordering.ORDERINGS and replaces MRV when set,
+    # cbj switches to conflict-directed backjumping with a store of up to nogoods nogoods,
+    # iterative runs the trail search on an explicit stack instead of recursion
+    def __init__(self, MRV=False, LSC=False, trail=False, bitset=False, mac=False, preprocess=False,
+                 ordering=None, cbj=False, nogoods=0, iterative=False) -> None:
         self.solutions = {}
+        self.MRV = MRV
+        self.LSC = LSC
+        self.trail = trail
+        self.bitset = bitset
+        self.mac = mac
+        self.preprocess = preprocess
+        self.ordering = ordering
+        self.cbj = cbj
+        self.nogoods = nogoods
+        self.iterative = iterative
 
     # Must be overridden by subclasses
     @abstractmethod
     def solve(self, n: int, grid: Grid, to_first_solution: bool, forward_checking: bool) -> None:
         ...
 
+    # CSP with the part of the model every grid of size n shares: variables, domains and
+    # the constraints that do not depend on the grid
+    @abstractmethod
+    def compile(self, n: int) -> 'CSP':
+        ...
+
+    # Add what is particular to a grid to a clone of the compiled model, returns the
+    # start assignment
+    @abstractmethod
+    def bind(self, csp: 'CSP', grid: Grid) -> dict:
+        ...
+
+    # Options the compiled model depends on besides the problem and the size
+    def template_key(self, n: int) -> tuple:
+        return type(self), n, self.bitset
+
+    # Compiled model for grids of size n, built once and kept in the shared cache
+    def template(self, n: int) -> 'CSP':
+        return self.templates.get(self.template_key(n), lambda: self.compile(n).finish())
+
+    # Build the CSP for a grid, returns it with the start assignment
+    def build(self, n: int, grid: Grid) -> tuple['CSP', dict]:
+        csp = self.template(n).clone()
+        return csp, self.bind(csp, grid)
+
+    # Run the configured search mode on a built CSP within the limits set on it
+    def search(self, csp, assignment, to_first_solution: bool, forward_checking: bool) -> SearchResult:
+        return csp.collect(self.stream(csp, assignment, forward_checking, 1 if to_first_solution else None))
+
+    # Apply the search options that act on the CSP itself before searching it; returns
+    # False when preprocessing wiped out a domain, the grid has no solution then
+    def prepare(self, csp, assignment) -> bool:
+        if self.preprocess and not csp.preprocess(assignment):
+            return False
+        if self.ordering is not None:
+            csp.use_ordering(self.ordering)
+        return True
+
+    # Lazily yield the solutions of a built CSP with the configured search mode
+    # under the external names of the variables
+    def stream(self, csp, assignment, forward_checking: bool, limit=None) -> Iterator[dict]:
+        if not self.prepare(csp, assignment):
+            return iter(())
+        solutions = csp.iter_solutions(assignment, forward_checking=forward_checking, MRV=self.MRV, LSC=self.LSC,
+                                       trail=self.trail, mac=self.mac, limit=limit, cbj=self.cbj,
+                                       nogoods=self.nogoods, iterative=self.iterative)
+        return solutions if csp.labels is None else csp.labelled(solutions)
+
+    # Yield the solutions of a grid one by one as they are found
+    def iter_solutions(self, n: int, grid: Grid, forward_checking: bool, limit=None) -> Iterator[dict]:
+        csp, assignment = self.build(n, grid)
+        return self.stream(csp, assignment, forward_checking, limit)
+
+    # Count the solutions of a grid without storing them; returns the number of
+    # solutions, the nodes visited until the first one and in total
+    def count_solutions(self, n: int, grid: Grid, forward_checking: bool, limit=None) -> tuple[int, int, int]:
+        csp, assignment = self.build(n, grid)
+        count, first = 0, 0
+        for _ in self.stream(csp, assignment, forward_checking, limit):
+            count += 1
+            if count == 1:
+                first = csp.nodes_visited
+        return count, first, csp.nodes_visited
+
 
 class CSP(Generic[V, D]):
-    def __init__(self, variables: List[V], domains: Dict[V, List[D]]) -> None:
+    # Models with many variables number them 0..n-1 and pass labels, the names the
+    # variables have outside the solver: the search then only hashes small ints and
+    # label() gives solutions back under the names
+    def __init__(self, variables: List[V], domains: Dict[V, List[D]], bitset=False,
+                 labels: Optional[List[Any]] = None) -> None:
         self.variables: List[V] = variables  # variables to be constrained
-        self.domains: Dict[V, List[D]] = domains  # domain of each variable
-        self.domains_copy = copy.deepcopy(domains)
+        self.index: Dict[V, int] = {variable: i for i, variable in enumerate(variables)}
+        self.labels = labels
+        # domain of each variable, optionally packed into bitmasks for small domains
+        self.domains = BitsetDomains(domains) if bitset else ListDomains(domains)
+        self.domains_copy = self.domains.copy()
         self.constraints: Dict[V, List[Constraint[V, D]]] = {}
         self.constr_map_variable: Dict[Constraint[V, D], List[V]] = {}
         self.solutions = []
         self.nodes_visited = 0
+        # undo stack of (variable, saved domain) pairs used by the trail search mode
+        self.trail: List[tuple[V, Any]] = []
+        # last support found for (constraint, variable, value), tried first on the next revision
+        self.supports: Dict[tuple[Constraint[V, D], V, D], tuple[tuple[V, D], ...]] = {}
+        # least constraining value orders per variable with the state they were computed in,
+        # and the variables whose assignment that state covers
+        self.lsc_cache: Dict[V, tuple[Any, Dict[D, int]]] = {}
+        self.lsc_regions: Dict[V, List[V]] = {}
+        # masks of the values of a neighbour allowed next to (variable, value), bitset store only
+        self.allowed_masks: Dict[tuple[V, D, V], Optional[int]] = {}
+        # random source breaking ties between values in the trail search, None for domain order
+        self.random: Optional[random.Random] = None
+        # limits of the search, see set_limits
+        self.node_limit: Optional[int] = None
+        self.deadline: Optional[float] = None
+        self.cancel = None
+        # node count at which the limits are checked next, None without limits
+        self.next_check: Optional[int] = None
+        # search instrumentation, None while disabled
+        self.stats: Optional[SearchStats] = None
+        # variable ordering kept up to date by the trail search, None for the MRV flag
+        self.ordering: Optional[VariableOrdering] = None
+        # distinct variables sharing a constraint with each variable, built on demand
+        self.neighbour_lists: Dict[V, List[V]] = {}
         for variable in self.variables:
             self.constraints[variable] = []
             if variable not in self.domains:
@@ -39,31 +192,222 @@ class CSP(Generic[V, D]):
         self.constr_map_variable[constraint] = constraint.variables
         # print(self.constr_map_variable[constraint])
         for variable in constraint.variables:
-            if variable not in self.variables:
+            if variable not in self.index:
                 raise LookupError("Variable in constraint not in CSP")
             else:
                 self.constraints[variable].append(constraint)
+                self.neighbour_lists.pop(variable, None)
+        # replaced rather than cleared, clones may share the regions of their model
+        self.lsc_regions = {}
+        self.allowed_masks = {}
+
+    # Compute the neighbour lists of every variable ahead, for a model that is cloned
+    # many times. Returns the CSP
+    def finish(self) -> 'CSP[V, D]':
+        for variable in self.variables:
+            self.neighbours(variable)
+        return self
+
+    # Copy of the CSP to search on its own. The variables, the constraints and what is
+    # derived from them are shared, only the containers that searching or adding
+    # constraints change are copied, and the stateful constraints so that clones can be
+    # searched side by side; the domains are copied shallowly, domain stores never change
+    # a domain in place. Value ordering regions and allowed masks are computed on demand
+    # into the dicts of the model until a clone adds constraints of its own
+    def clone(self) -> 'CSP[V, D]':
+        other = copy.copy(self)
+        other.domains = self.domains.copy()
+        other.domains_copy = self.domains_copy.copy()
+        fresh = {constraint: constraint.fresh() for constraint in self.constr_map_variable if constraint.stateful}
+        if fresh:
+            other.constraints = {variable: [fresh.get(constraint, constraint) for constraint in constraints]
+                                 for variable, constraints in self.constraints.items()}
+            other.constr_map_variable = {fresh.get(constraint, constraint): scope
+                                         for constraint, scope in self.constr_map_variable.items()}
+        else:
+            other.constraints = {variable: list(constraints) for variable, constraints in self.constraints.items()}
+            other.constr_map_variable = dict(self.constr_map_variable)
+        other.neighbour_lists = dict(self.neighbour_lists)
+        other.solutions = []
+        other.nodes_visited = 0
+        other.trail = []
+        other.supports = {}
+        other.lsc_cache = {}
+        other.random = None
+        other.set_limits()
+        other.stats = None
+        other.ordering = None
+        other.__dict__.pop('consistent', None)
+        return other
+
+    # A solution under the labels of the variables
+    def label(self, solution: Dict[V, D]) -> dict:
+        if self.labels is None:
+            return solution
+        labels = self.labels
+        return {labels[variable]: value for variable, value in solution.items()}
+
+    # Solutions of a search under the labels, closing the search when closed early
+    def labelled(self, solutions: Iterator[Dict[V, D]]) -> Iterator[dict]:
+        try:
+            for solution in solutions:
+                yield self.label(solution)
+        finally:
+            solutions.close()
 
     # Check if the value assignment is consistent by checking all constraints
-    # for the given variable against it
+    # for the given variable against it, only looking at what the new value can break
     def consistent(self, variable: V, assignment: Dict[V, D]) -> bool:
         for constraint in self.constraints[variable]:
-            if not constraint.satisfied(assignment):
+            if not constraint.satisfied_by(variable, assignment):
+                return False
+        return True
+
+    # First constraint of variable violated by the assignment, None if there is none
+    def violated(self, variable: V, assignment: Dict[V, D]) -> Optional[Constraint[V, D]]:
+        for constraint in self.constraints[variable]:
+            if not constraint.satisfied_by(variable, assignment):
+                return constraint
+        return None
+
+    # Select variables with the named ordering of Ordering.ORDERINGS, e.g. 'dom/wdeg'
+    def use_ordering(self, name: str) -> VariableOrdering:
+        self.ordering = ORDERINGS[name](self)
+        return self.ordering
+
+    # Instrument the search: constraint checks are timed per constraint class, nodes,
+    # backtracks and wipe-outs are counted and the callbacks are called. Returns the stats
+    def enable_stats(self, on_assign=None, on_backtrack=None, on_solution=None) -> SearchStats:
+        self.stats = SearchStats(on_assign, on_backtrack, on_solution)
+        # swapped in on the instance, so the uninstrumented check pays nothing
+        self.consistent = self.instrumented_consistent
+        return self.stats
+
+    def disable_stats(self) -> None:
+        self.stats = None
+        self.__dict__.pop('consistent', None)
+
+    def instrumented_consistent(self, variable: V, assignment: Dict[V, D]) -> bool:
+        for constraint in self.constraints[variable]:
+            start = time.perf_counter()
+            satisfied = constraint.satisfied_by(variable, assignment)
+            self.stats.checked(constraint, time.perf_counter() - start, satisfied)
+            if not satisfied:
                 return False
         return True
 
-    def backtracking_search(self, assignment=None, to_first_solution=True, MRV=False, LSC=False) -> dict[V, D] | None:
+    def backtracking_search(self, assignment=None, to_first_solution=True, MRV=False, LSC=False) -> SearchResult:
+        return self.collect(self.iter_solutions(assignment, False, MRV, LSC, limit=1 if to_first_solution else None))
+
+    def forward_checking_search(self, assignment=None, to_first_solution=True, MRV=False, LSC=False,
+                                trail=False) -> SearchResult:
+        return self.collect(self.iter_solutions(assignment, True, MRV, LSC, trail,
+                                                limit=1 if to_first_solution else None))
+
+    # Maintaining arc consistency: the start assignment is made arc consistent once and
+    # consistency is re-established after every assignment
+    def mac_search(self, assignment=None, to_first_solution=True, MRV=False, LSC=False) -> SearchResult:
+        return self.collect(self.iter_solutions(assignment, MRV=MRV, LSC=LSC, mac=True,
+                                                limit=1 if to_first_solution else None))
+
+    # Conflict-directed backjumping, optionally on top of forward checking, learning up to
+    # nogoods failed partial assignments
+    def backjumping_search(self, assignment=None, to_first_solution=True, MRV=False, LSC=False,
+                           forward_checking=False, nogoods=0) -> SearchResult:
+        return self.collect(self.iter_solutions(assignment, forward_checking, MRV, LSC,
+                                                limit=1 if to_first_solution else None, cbj=True, nogoods=nogoods))
+
+    # Store solutions together with the nodes visited until each was found. A limit
+    # reached on the way ends the search early; returns what it found either way
+    def collect(self, solutions) -> SearchResult:
+        start = time.perf_counter()
+        first = len(self.solutions)
+        limit = None
+        try:
+            for solution in solutions:
+                self.solutions.append((solution, self.nodes_visited))
+        except LimitReached as reached:
+            limit = reached.reason
+        return SearchResult(self.solutions[first:], self.nodes_visited, time.perf_counter() - start, limit,
+                            self.stats)
+
+    # Limit the searches on this CSP to max_nodes nodes in all, until deadline on the
+    # time.monotonic() clock and until cancel is set, which can be anything with an
+    # is_set() method such as a threading.Event set from another thread. None lifts a
+    # limit, no arguments lift them all. The search methods stop at the first limit
+    # reached and report it in their result; generators of solutions raise LimitReached
+    def set_limits(self, max_nodes: Optional[int] = None, deadline: Optional[float] = None, cancel=None) -> None:
+        self.node_limit = max_nodes
+        self.deadline = deadline
+        self.cancel = cancel
+        self.schedule_check()
+
+    # The node loops compare nodes_visited with next_check before counting a node, the
+    # clock and the token are looked at every LIMIT_CHECK_INTERVAL nodes and the search
+    # stops with max_nodes nodes counted, never more
+    def schedule_check(self) -> None:
+        if self.deadline is None and self.cancel is None:
+            self.next_check = self.node_limit
+        else:
+            self.next_check = self.nodes_visited + LIMIT_CHECK_INTERVAL
+            if self.node_limit is not None:
+                self.next_check = min(self.next_check, self.node_limit)
+
+    # Yield each solution as soon as it is found, stopping after limit solutions.
+    # Nothing is kept, so memory stays flat however many solutions there are.
+    # iterative runs BT, FC (always in trail mode) or MAC on IterativeSearch
+    def iter_solutions(self, assignment=None, forward_checking=False, MRV=False, LSC=False, trail=False,
+                       mac=False, limit=None, cbj=False, nogoods=0, iterative=False) -> Iterator[Dict[V, D]]:
+        if cbj:
+            if mac:
+                raise ValueError("Backjumping supports backtracking and forward checking only")
+            solutions = self.cbj_solutions(assignment, forward_checking, MRV, LSC, nogoods)
+        elif iterative:
+            solutions = IterativeSearch(self, assignment, forward_checking, mac, MRV, LSC)
+        elif mac:
+            solutions = self.mac_solutions(assignment, MRV, LSC)
+        elif forward_checking:
+            solutions = self.forward_checking_solutions(assignment, MRV, LSC, trail)
+        else:
+            solutions = self.backtracking_solutions(assignment, MRV, LSC)
+        try:
+            if limit is not None and limit <= 0:
+                return
+            for count, solution in enumerate(solutions, 1):
+                if self.stats is not None:
+                    self.stats.found(solution)
+                yield solution
+                if count == limit:
+                    return
+        finally:
+            solutions.close()
+
+    # Count solutions without storing them; returns the number of solutions, the nodes
+    # visited until the first one and the nodes visited in total
+    def count_solutions(self, assignment=None, forward_checking=False, MRV=False, LSC=False, trail=False,
+                        mac=False, limit=None, cbj=False, nogoods=0, iterative=False) -> tuple[int, int, int]:
+        count, first = 0, 0
+        for _ in self.iter_solutions(assignment, forward_checking, MRV, LSC, trail, mac, limit, cbj, nogoods,
+                                     iterative):
+            count += 1
+            if count == 1:
+                first = self.nodes_visited
+        return count, first, self.nodes_visited
+
+    def backtracking_solutions(self, assignment=None, MRV=False, LSC=False) -> Iterator[Dict[V, D]]:
         # assignment is complete if every variable is assigned (our base case)
         if assignment is None:
             assignment = {}
         if len(assignment) == len(self.variables):
-            self.solutions.append((assignment, self.nodes_visited))
+            yield assignment
             return
 
         # get all variables in the CSP but not in the assignment
         unassigned: List[V] = [v for v in self.variables if v not in assignment]
 
-        if MRV:
+        if self.ordering is not None:
+            first: V = self.ordering.select(unassigned)
+        elif MRV:
             first: V = self.MRV(unassigned)
         else:
             first: V = unassigned[0]
@@ -74,27 +418,37 @@ class CSP(Generic[V, D]):
             values = self.domains[first]
 
         for value in values:
+            if self.next_check is not None and self.nodes_visited >= self.next_check:
+                self.check_limit()
             self.nodes_visited += 1
+            if self.stats is not None:
+                self.stats.assigned(first, value, len(assignment))
+                found = self.stats.solutions
             local_assignment = assignment.copy()
             local_assignment[first] = value
             # if we're still consistent, we recurse (continue)
             if self.consistent(first, local_assignment):
-                self.backtracking_search(local_assignment, to_first_solution, MRV, LSC)
-                # if we didn't find the result, we will end up backtracking
-                if to_first_solution and self.solutions:
-                    return
-        return
+                yield from self.backtracking_solutions(local_assignment, MRV, LSC)
+            if self.stats is not None and self.stats.solutions == found:
+                self.stats.backtracked(first, len(assignment))
 
-    def forward_checking_search(self, assignment=None, to_first_solution=True, MRV=False, LSC=False) -> dict[V, D] | None:
+    def forward_checking_solutions(self, assignment=None, MRV=False, LSC=False,
+                                   trail=False) -> Iterator[Dict[V, D]]:
+        if trail:
+            # prune with the start assignment once, so the search begins from consistent domains
+            yield from self.propagated_solutions(assignment, *self.propagators(forward_checking=True), MRV, LSC)
+            return
         if assignment is None:
             assignment = {}
         if len(assignment) == len(self.variables):
-            self.solutions.append((assignment, self.nodes_visited))
+            yield assignment
             return
 
         unassigned: List[V] = [v for v in self.variables if v not in assignment]
         # print(self.domains)
-        if MRV:
+        if self.ordering is not None:
+            first: V = self.ordering.select(unassigned)
+        elif MRV:
             first: V = self.MRV(unassigned)
         else:
             first: V = unassigned[0]
@@ -103,27 +457,450 @@ class CSP(Generic[V, D]):
             values = self.LSC(first, assignment, unassigned)
         else:
             values = self.domains[first]
+        # with MRV first is not always the head of the list
+        others = [v for v in unassigned if v != first]
 
         for value in values:
+            if self.next_check is not None and self.nodes_visited >= self.next_check:
+                self.check_limit()
             self.nodes_visited += 1
+            if self.stats is not None:
+                self.stats.assigned(first, value, len(assignment))
+                found = self.stats.solutions
             local_assignment = assignment.copy()
             local_assignment[first] = value
 
             if self.consistent(first, local_assignment):
                 emptyDomainFound = False
-                for variable in self.get_unassigned_from_constraints(first, unassigned[1:]):
+                pruned = []
+                for variable in self.get_unassigned_from_constraints(first, others):
                     wipe, new_domain = self.forward_check(variable, local_assignment)
                     if wipe:
+                        if self.stats is not None:
+                            self.stats.wiped_out()
                         emptyDomainFound = True
-                        self.domains = copy.deepcopy(self.domains_copy)
+                        self.domains = self.domains_copy.copy()
                         break
                     else:
-                        self.domains[variable] = new_domain
+                        pruned.append((variable, self.domains.save(variable)))
+                        self.domains.load(variable, new_domain)
                 if not emptyDomainFound:
-                    self.forward_checking_search(local_assignment, to_first_solution, MRV, LSC)
-                    if to_first_solution and self.solutions:
-                        return
-        return
+                    # what this value pruned must not outlive it, with MRV the variables are
+                    # not always checked again before they are branched on; a limit or an
+                    # early close() ends the subtree too
+                    try:
+                        yield from self.forward_checking_solutions(local_assignment, MRV, LSC)
+                    finally:
+                        for variable, state in pruned:
+                            self.domains.load(variable, state)
+            if self.stats is not None and self.stats.solutions == found:
+                self.stats.backtracked(first, len(assignment))
+
+    def mac_solutions(self, assignment=None, MRV=False, LSC=False) -> Iterator[Dict[V, D]]:
+        yield from self.propagated_solutions(assignment, *self.propagators(mac=True), MRV, LSC)
+
+    # Trail search that first propagates the start assignment with root(assignment)
+    def propagated_solutions(self, assignment, root, propagate, MRV=False, LSC=False) -> Iterator[Dict[V, D]]:
+        assignment = dict(assignment) if assignment is not None else {}
+        mark = len(self.trail)
+        try:
+            if root(assignment):
+                yield from self.trail_solutions(assignment, propagate, MRV, LSC)
+        finally:
+            self.undo(mark)
+
+    # Search on a single assignment that records every domain change on the trail, so
+    # backtracking only undoes what its own branch changed. Domains and assignment are
+    # restored even when the consumer stops early
+    def trail_solutions(self, assignment: Dict[V, D], propagate, MRV=False, LSC=False) -> Iterator[Dict[V, D]]:
+        if len(assignment) == len(self.variables):
+            yield assignment.copy()
+            return
+        for _ in self.branches(assignment, propagate, MRV, LSC):
+            yield from self.trail_solutions(assignment, propagate, MRV, LSC)
+
+    # One level of the trail search: applies each child of the node in place (assignment
+    # extended, domains pruned), yields the assigned variable and undoes the child when
+    # resumed. After each consistent assignment propagate(variable, assignment, unassigned)
+    # prunes the domains and returns False on a wipe-out. With an ordering set the next
+    # variable comes from its heap and no list of unassigned variables is built
+    def branches(self, assignment: Dict[V, D], propagate, MRV=False, LSC=False) -> Iterator[V]:
+        first, unassigned = self.next_variable(assignment, MRV)
+        values = self.value_order(first, assignment, LSC)
+
+        depth = len(assignment)
+        for value in values:
+            if self.next_check is not None and self.nodes_visited >= self.next_check:
+                self.check_limit()
+            self.nodes_visited += 1
+            if self.stats is not None:
+                self.stats.assigned(first, value, depth)
+                found = self.stats.solutions
+            assignment[first] = value
+            mark = len(self.trail)
+            try:
+                if not self.consistent(first, assignment):
+                    if self.ordering is not None:
+                        self.ordering.failed(self.violated(first, assignment))
+                elif propagate(first, assignment, unassigned):
+                    yield first
+            finally:
+                self.undo(mark)
+                del assignment[first]
+                if self.ordering is not None:
+                    self.ordering.unassigned(first)
+            if self.stats is not None and self.stats.solutions == found:
+                self.stats.backtracked(first, depth)
+
+    # Stop the search with LimitReached once one of its limits is reached
+    def check_limit(self) -> None:
+        if self.cancel is not None and self.cancel.is_set():
+            raise LimitReached('cancelled')
+        if self.deadline is not None and time.monotonic() >= self.deadline:
+            raise LimitReached('deadline')
+        if self.node_limit is not None and self.nodes_visited >= self.node_limit:
+            raise LimitReached('nodes')
+        self.schedule_check()
+
+    # Variable to branch on next in the trail search, with the list of unassigned variables
+    # (None when the ordering picked it)
+    def next_variable(self, assignment: Dict[V, D], MRV=False) -> tuple[V, Optional[List[V]]]:
+        if self.ordering is not None:
+            if self.ordering.assignment is not assignment:
+                self.ordering.attach(assignment)
+            return self.ordering.best(), None
+        unassigned: List[V] = [v for v in self.variables if v not in assignment]
+        if MRV:
+            return self.MRV(unassigned), unassigned
+        return unassigned[0], unassigned
+
+    # Trail search with conflict-directed backjumping: a failed subtree reports the assigned
+    # variables responsible for it and the search jumps straight back to the deepest one.
+    # With forward_checking the domains of the neighbours are pruned after each assignment.
+    # With nogoods > 0 the conflicts of failed subtrees are kept as nogoods in an LRU store
+    # of that size and prune the branches that would repeat them
+    def cbj_solutions(self, assignment=None, forward_checking=False, MRV=False, LSC=False,
+                      nogoods=0) -> Iterator[Dict[V, D]]:
+        assignment = dict(assignment) if assignment is not None else {}
+        root, _ = self.propagators(forward_checking)
+        store = NogoodStore(nogoods) if nogoods > 0 else None
+        mark = len(self.trail)
+        try:
+            if root(assignment):
+                # values removed from here on are explained by the search assignment
+                start_domains = self.snapshot(assignment)
+                yield from self.backjumping(assignment, forward_checking, start_domains, MRV, LSC, store)
+        finally:
+            self.undo(mark)
+
+    # One node of the backjumping search. Returns the conflict set of the node once all its
+    # values failed, or None when a solution was found below it and no jump is allowed
+    def backjumping(self, assignment: Dict[V, D], forward_checking: bool, start_domains: Dict[V, List[D]],
+                    MRV: bool, LSC: bool, store: Optional[NogoodStore]):
+        if len(assignment) == len(self.variables):
+            yield assignment.copy()
+            return None
+        first, unassigned = self.next_variable(assignment, MRV)
+        values = self.value_order(first, assignment, LSC)
+
+        conflicts = set()
+        solved = False
+        jump = None
+        depth = len(assignment)
+        for value in values:
+            if self.next_check is not None and self.nodes_visited >= self.next_check:
+                self.check_limit()
+            self.nodes_visited += 1
+            if self.stats is not None:
+                self.stats.assigned(first, value, depth)
+                found = self.stats.solutions
+            assignment[first] = value
+            mark = len(self.trail)
+            try:
+                nogood = store.match(first, value, assignment) if store is not None else None
+                constraint = self.violated(first, assignment) if nogood is None else None
+                if nogood is not None:
+                    conflicts.update(variable for variable, _ in nogood)
+                elif constraint is not None:
+                    if self.ordering is not None:
+                        self.ordering.failed(constraint)
+                    conflicts.update(constraint.explain(first, assignment))
+                else:
+                    wiped = self.wiped_neighbour(first, assignment) if forward_checking else None
+                    if wiped is not None:
+                        conflicts.update(self.refutation(wiped, assignment, start_domains[wiped]))
+                    else:
+                        below = yield from self.backjumping(assignment, forward_checking, start_domains, MRV, LSC,
+                                                            store)
+                        if below is None:
+                            solved = True
+                        elif first not in below and not solved:
+                            # first had no part in the failure: jump over its remaining values
+                            jump = below
+                        else:
+                            if store is not None:
+                                store.add(frozenset((variable, assignment[variable]) for variable in below))
+                            conflicts.update(below)
+            finally:
+                self.undo(mark)
+                del assignment[first]
+                if self.ordering is not None:
+                    self.ordering.unassigned(first)
+            if self.stats is not None and self.stats.solutions == found:
+                self.stats.backtracked(first, depth)
+            if jump is not None:
+                return jump
+        if solved:
+            return None
+        # values pruned before this node was reached were ruled out by earlier assignments
+        missing = [value for value in start_domains[first] if not self.domains.contains(first, value)]
+        conflicts.update(self.refutation(first, assignment, missing))
+        conflicts.discard(first)
+        return conflicts
+
+    # Assigned variables that rule out the given values of variable
+    def refutation(self, variable: V, assignment: Dict[V, D], values: List[D]) -> set:
+        conflicts = set()
+        for value in values:
+            assignment[variable] = value
+            constraint = self.violated(variable, assignment)
+            if constraint is not None:
+                conflicts.update(constraint.explain(variable, assignment))
+        assignment.pop(variable, None)
+        return conflicts
+
+    # Propagation used by the trail search modes, as (at the root, after each assignment)
+    def propagators(self, forward_checking=False, mac=False):
+        if mac:
+            return (lambda assignment: self.arc_consistency(assignment)), self.maintain_arc_consistency
+        if forward_checking:
+            return (lambda assignment: all(self.prune_neighbours(variable, assignment, self.variables)
+                                           for variable in list(assignment))), self.prune_neighbours
+        return (lambda assignment: True), (lambda variable, assignment, unassigned: True)
+
+    # Domains of the unassigned variables, enough to restart the search from this node
+    def snapshot(self, assignment: Dict[V, D]) -> Dict[V, List[D]]:
+        return {v: list(self.domains[v]) for v in self.variables if v not in assignment}
+
+    def load_snapshot(self, domains: Dict[V, List[D]]) -> None:
+        for variable, values in domains.items():
+            self.domains[variable] = values
+            if self.ordering is not None:
+                self.ordering.changed(variable)
+
+    # Replace the domain of a variable, remembering the old one on the trail
+    def restrict(self, variable: V, values: List[D]) -> None:
+        self.trail.append((variable, self.domains.save(variable)))
+        self.domains[variable] = values
+        if self.ordering is not None:
+            self.ordering.changed(variable)
+
+    # Roll domains back to the state they had when the trail was mark entries long
+    def undo(self, mark: int) -> None:
+        while len(self.trail) > mark:
+            variable, state = self.trail.pop()
+            self.domains.load(variable, state)
+            if self.ordering is not None:
+                self.ordering.changed(variable)
+
+    # Count a wipe-out and let the ordering learn from the constraints that caused it
+    def wiped_out(self, constraints) -> None:
+        if self.stats is not None:
+            self.stats.wiped_out()
+        if self.ordering is not None:
+            for constraint in constraints:
+                self.ordering.failed(constraint)
+
+    # Distinct variables sharing a constraint with variable, variable excluded
+    def neighbours(self, variable: V) -> List[V]:
+        if variable not in self.neighbour_lists:
+            self.neighbour_lists[variable] = [v for v in self.get_unassigned_from_constraints(variable, self.index)
+                                              if v != variable]
+        return self.neighbour_lists[variable]
+
+    # Remove values inconsistent with the assignment from the domains of the unassigned
+    # neighbours of variable; returns False when some domain is wiped out
+    def prune_neighbours(self, variable: V, assignment: Dict[V, D], unassigned=None) -> bool:
+        return self.wiped_neighbour(variable, assignment) is None
+
+    # Forward check of the neighbours of variable, returns the first neighbour whose
+    # domain is wiped out or None
+    def wiped_neighbour(self, variable: V, assignment: Dict[V, D]) -> Optional[V]:
+        if isinstance(self.domains, BitsetDomains):
+            return self.wiped_neighbour_mask(variable, assignment)
+        for neighbour in self.neighbours(variable):
+            if neighbour in assignment:
+                continue
+            domain = self.domains[neighbour]
+            survivors = []
+            for value in domain:
+                assignment[neighbour] = value
+                if self.consistent(neighbour, assignment):
+                    survivors.append(value)
+            # never assigned when the domain was empty to begin with
+            assignment.pop(neighbour, None)
+            if not survivors:
+                self.wiped_out(c for c in self.constraints[neighbour] if variable in self.constr_map_variable[c])
+                return neighbour
+            if len(survivors) != self.domains.size(neighbour):
+                self.restrict(neighbour, survivors)
+        return None
+
+    # wiped_neighbour on the masks of the bitset store. The values a neighbour keeps are
+    # looked up when the constraints it shares with variable are pairwise: the rest of the
+    # assignment was forward checked when it was made, so variable is all that is new
+    def wiped_neighbour_mask(self, variable: V, assignment: Dict[V, D]) -> Optional[V]:
+        masks = self.domains.masks
+        value = assignment[variable]
+        for neighbour in self.neighbours(variable):
+            if neighbour in assignment:
+                continue
+            mask = masks[neighbour]
+            survivors = self.allowed(variable, value, neighbour)
+            if survivors is not None:
+                survivors &= mask
+            else:
+                survivors = mask
+                for other, bit in self.domains.entries(mask):
+                    assignment[neighbour] = other
+                    if not self.consistent(neighbour, assignment):
+                        survivors ^= bit
+                assignment.pop(neighbour, None)
+            if not survivors:
+                self.wiped_out(c for c in self.constraints[neighbour] if variable in self.constr_map_variable[c])
+                return neighbour
+            if survivors != mask:
+                self.trail.append((neighbour, mask))
+                masks[neighbour] = survivors
+                if self.ordering is not None:
+                    self.ordering.changed(neighbour)
+        return None
+
+    # Mask of the values of neighbour that the constraints it shares with variable allow
+    # next to variable = value, None when one of those constraints is not pairwise.
+    # Bitset store only, worked out on first use
+    def allowed(self, variable: V, value: D, neighbour: V) -> Optional[int]:
+        key = (variable, value, neighbour)
+        if key in self.allowed_masks:
+            return self.allowed_masks[key]
+        shared = [c for c in self.constraints[neighbour] if variable in self.constr_map_variable[c]]
+        mask = None
+        if all(constraint.pairwise for constraint in shared):
+            mask = 0
+            for other, bit in self.domains.entries(self.domains.full):
+                pair = {variable: value, neighbour: other}
+                if all(constraint.satisfied_by(neighbour, pair) for constraint in shared):
+                    mask |= bit
+        self.allowed_masks[key] = mask
+        return mask
+
+    # Root-level preprocessing: make the domains arc consistent with the start assignment
+    # for good, so every search mode starts from the reduced domains. Returns False when
+    # a domain is wiped out, i.e. the problem has no solution
+    def preprocess(self, assignment=None) -> bool:
+        consistent = self.arc_consistency(dict(assignment) if assignment is not None else {})
+        self.trail.clear()
+        self.domains_copy = self.domains.copy()
+        return consistent
+
+    def maintain_arc_consistency(self, variable: V, assignment: Dict[V, D], unassigned) -> bool:
+        return self.arc_consistency(assignment, [variable])
+
+    # GAC-3 with residual supports. Revises every (constraint, unassigned variable) pair,
+    # or only the constraints of the changed variables, until no domain changes.
+    # Propagating constraints filter all their variables in one step.
+    # Domain changes go on the trail; returns False when some domain is wiped out
+    def arc_consistency(self, assignment: Dict[V, D], changed: Optional[List[V]] = None) -> bool:
+        if changed is None:
+            constraints = list(self.constr_map_variable)
+        else:
+            constraints = list(dict.fromkeys(c for v in changed for c in self.constraints[v]))
+        queue = deque()
+        queued = set()
+        for constraint in constraints:
+            self.schedule(constraint, None, assignment, queue, queued)
+        while queue:
+            pair = queue.popleft()
+            queued.discard(pair)
+            constraint, variable = pair
+            if variable is None:
+                # propagating constraints prune all their variables at once
+                if self.stats is None:
+                    modified = constraint.propagate(self, assignment)
+                else:
+                    start = time.perf_counter()
+                    modified = constraint.propagate(self, assignment)
+                    self.stats.checked(constraint, time.perf_counter() - start, modified is not None)
+                if modified is None:
+                    self.wiped_out([constraint])
+                    return False
+            elif variable in assignment or not self.revise(constraint, variable, assignment):
+                continue
+            elif self.domains.size(variable) == 0:
+                self.wiped_out([constraint])
+                return False
+            else:
+                modified = [variable]
+            # only constraints that look at domains can lose supports because of these changes
+            for x in modified:
+                for other in self.constraints[x]:
+                    if other is not constraint and (other.propagates or
+                                                    len(self.constr_map_variable[other]) <= MAX_SUPPORT_ARITY):
+                        self.schedule(other, x, assignment, queue, queued)
+        return True
+
+    # Queue the revisions of constraint, except the one of the variable that caused it
+    def schedule(self, constraint: Constraint[V, D], cause: Optional[V], assignment: Dict[V, D], queue,
+                 queued) -> None:
+        if constraint.propagates:
+            pairs = [(constraint, None)]
+        else:
+            pairs = [(constraint, y) for y in self.constr_map_variable[constraint] if y != cause and y not in assignment]
+        for pair in pairs:
+            if pair not in queued:
+                queue.append(pair)
+                queued.add(pair)
+
+    # Remove the values of variable without a support in constraint; returns True if the domain changed
+    def revise(self, constraint: Constraint[V, D], variable: V, assignment: Dict[V, D]) -> bool:
+        scope = self.constr_map_variable[constraint]
+        full_check = len(scope) <= MAX_SUPPORT_ARITY
+        others = [y for y in scope if y != variable and y not in assignment]
+        survivors = []
+        for value in self.domains[variable]:
+            assignment[variable] = value
+            if full_check:
+                if self.has_support(constraint, variable, value, others, assignment):
+                    survivors.append(value)
+            elif constraint.satisfied_by(variable, assignment):
+                survivors.append(value)
+        assignment.pop(variable, None)
+        if len(survivors) == self.domains.size(variable):
+            return False
+        self.restrict(variable, survivors)
+        return True
+
+    # Look for values of the other unassigned variables of constraint that satisfy it
+    # together with the assignment, starting with the last support found
+    def has_support(self, constraint: Constraint[V, D], variable: V, value: D, others: List[V],
+                    assignment: Dict[V, D]) -> bool:
+        key = (constraint, variable, value)
+        residue = self.supports.get(key)
+        candidates = itertools.product(*(self.domains[y] for y in others))
+        if residue is not None and [y for y, _ in residue] == others and \
+                all(self.domains.contains(y, b) for y, b in residue):
+            candidates = itertools.chain([tuple(b for _, b in residue)], candidates)
+        try:
+            for values in candidates:
+                for y, b in zip(others, values):
+                    assignment[y] = b
+                if constraint.satisfied(assignment):
+                    self.supports[key] = tuple(zip(others, values))
+                    return True
+            return False
+        finally:
+            for y in others:
+                assignment.pop(y, None)
 
     def get_unassigned_from_constraints(self, curr_variable, unassigned):
         # unnecessary when we have constraints related to all variables
@@ -137,39 +914,99 @@ class CSP(Generic[V, D]):
 
     def MRV(self, unassigned):
         best_variable = unassigned[0]
-        best_length = len(self.domains[best_variable])
+        best_length = self.domains.size(best_variable)
         for var in unassigned:
-            curr_length = len(self.domains[var])
+            curr_length = self.domains.size(var)
             if curr_length < best_length:
                 best_variable = var
                 best_length = curr_length
         return best_variable
 
+    # Least constraining value: order the values of variable by how many values they rule
+    # out in the domains of its unassigned neighbours. Works on the assignment in place.
+    # Neighbour values that are inconsistent whatever variable takes count the same for
+    # every value, so they are skipped. The order is cached per variable and reused while
+    # the neighbour domains and the assignment around the variable stay the same
     def LSC(self, variable, assignment, unassigned):
-        ordered_domain = {}
-        unassigned_const = self.get_unassigned_from_constraints(variable, unassigned)
-        # temp_assignment = copy.deepcopy(assignment)
-        for value in self.domains[variable]:
-            ordered_domain[value] = 0
-            # temp_assignment = copy.deepcopy(assignment)
-            # temp_assignment[variable] = value
-            for var in unassigned_const:
-                temp_assignment = copy.deepcopy(assignment)
-                temp_assignment[variable] = value
-                for dom in self.domains[var]:
-                    temp_assignment[var] = dom
-                    # print(temp_assignment)
-                    if not self.consistent(var, temp_assignment):
-                        ordered_domain[value] += 1
-        ordered = {k: v for k, v in sorted(ordered_domain.items(), key=lambda item: item[1], reverse=False)}
-        # print(ordered)
-        return ordered.keys()
+        ruled_out = self.ruled_out(variable, assignment)
+        return sorted(self.domains[variable], key=ruled_out.get)
 
+    # Values of variable in the order the trail search tries them: shuffled when a random
+    # source is set, then stably sorted by least constraining value with LSC
+    def value_order(self, variable, assignment, LSC=False) -> List[D]:
+        values = list(self.domains[variable])
+        if self.random is not None:
+            self.random.shuffle(values)
+        if LSC:
+            values.sort(key=self.ruled_out(variable, assignment).get)
+        return values
+
+    # Variables whose assignment decides how many values each value of variable rules out:
+    # the neighbours of variable and theirs
+    def region(self, variable: V) -> List[V]:
+        if variable not in self.lsc_regions:
+            region = dict.fromkeys(v for var in self.get_unassigned_from_constraints(variable, self.index)
+                                   for v in self.get_unassigned_from_constraints(var, self.index))
+            self.lsc_regions[variable] = list(region)
+        return self.lsc_regions[variable]
+
+    # Number of neighbour values each value of variable rules out, see LSC
+    def ruled_out(self, variable, assignment) -> Dict[D, int]:
+        neighbours = [var for var in self.neighbours(variable) if var not in assignment]
+        stamp = ([assignment.get(v) for v in self.region(variable)],
+                 [self.domains.save(var) for var in neighbours], self.domains.save(variable))
+        cached = self.lsc_cache.get(variable)
+        if cached is not None and cached[0] == stamp:
+            return cached[1]
+
+        values = list(self.domains[variable])
+        ruled_out = dict.fromkeys(values, 0)
+        bitset = isinstance(self.domains, BitsetDomains)
+        for var in neighbours:
+            if bitset and values and self.allowed(variable, values[0], var) is not None:
+                # the values of var consistent so far, less those each value of variable allows
+                kept = 0
+                for dom, bit in self.domains.entries(self.domains.masks[var]):
+                    assignment[var] = dom
+                    if self.consistent(var, assignment):
+                        kept |= bit
+                assignment.pop(var, None)
+                for value in values:
+                    ruled_out[value] += (kept & ~self.allowed(variable, value, var)).bit_count()
+                continue
+            for dom in self.domains[var]:
+                assignment[var] = dom
+                if self.consistent(var, assignment):
+                    for value in values:
+                        assignment[variable] = value
+                        if not self.consistent(var, assignment):
+                            ruled_out[value] += 1
+                    # neither is assigned when its domain is empty
+                    assignment.pop(variable, None)
+            assignment.pop(var, None)
+        self.lsc_cache[variable] = (stamp, ruled_out)
+        return ruled_out
+
+    # Values of the start domain of variable consistent with the assignment, as
+    # (wiped out, state of the domain store)
     def forward_check(self, variable, assignment):
-        values = copy.deepcopy(self.domains_copy[variable])
+        if isinstance(self.domains, BitsetDomains):
+            mask = self.domains_copy.masks[variable]
+            if all(constraint.pairwise for constraint in self.constraints[variable]):
+                # each assigned neighbour leaves the values its own value allows
+                for neighbour in self.neighbours(variable):
+                    if neighbour in assignment:
+                        mask &= self.allowed(neighbour, assignment[neighbour], variable)
+            else:
+                temp_assignment = assignment.copy()
+                for value, bit in self.domains_copy.entries(mask):
+                    temp_assignment[variable] = value
+                    if not self.consistent(variable, temp_assignment):
+                        mask ^= bit
+            return mask == 0, mask
         res = []
-        for value in values:
-            temp_assignment = copy.deepcopy(assignment)
+        temp_assignment = assignment.copy()
+        for value in self.domains_copy[variable]:
             temp_assignment[variable] = value
             if self.consistent(variable, temp_assignment):
                 res.append(value)
@@ -0,0 +1,63 @@
+import gzip
+import os
+import pickle
+from typing import List, Optional
+
+from CSP import Problem, Grid
+from Engine import IterativeSearch
+
+CHECKPOINT_VERSION = 2
+
+
+# Write a checkpoint atomically, so a crash while saving leaves the previous one intact.
+# Checkpoints are pickles: only load files this program wrote
+def save_checkpoint(path: str, checkpoint: dict) -> None:
+    tmp = path + '.tmp'
+    with gzip.open(tmp, 'wb') as file:
+        pickle.dump(checkpoint, file, protocol=pickle.HIGHEST_PROTOCOL)
+    os.replace(tmp, path)
+
+
+def load_checkpoint(path: str) -> dict:
+    with gzip.open(path, 'rb') as file:
+        return pickle.load(file)
+
+
+# Exhaustive search of a grid on IterativeSearch that saves its progress to path every
+# every nodes and resumes from path when it exists, so an interrupted run can be
+# restarted and gives the same result as an uninterrupted one. The checkpoint is removed
+# once the search is complete. Returns (number of solutions, solutions, nodes visited);
+# solutions are only kept with keep_solutions
+def checkpointed_search(problem: Problem, n: int, grid: Grid, forward_checking: bool, path: str,
+                        every: int = 100000, keep_solutions: bool = False) -> tuple[int, List[dict], int]:
+    csp, assignment = problem.build(n, grid)
+    if not problem.prepare(csp, assignment):
+        return 0, [], 0
+    search = IterativeSearch(csp, assignment, forward_checking, problem.mac, problem.MRV, problem.LSC)
+    # the compiled model, down to its domain store, and every option that shapes the search
+    instance = problem.template_key(n) + (grid, forward_checking, problem.mac, problem.MRV, problem.LSC,
+                                          problem.ordering, problem.preprocess)
+    count, solutions = 0, []
+    if os.path.exists(path):
+        checkpoint = load_checkpoint(path)
+        if checkpoint['version'] != CHECKPOINT_VERSION or checkpoint['instance'] != instance:
+            raise ValueError("Checkpoint " + path + " belongs to another search")
+        count, solutions = checkpoint['count'], checkpoint['solutions']
+        search.load(checkpoint['search'])
+
+    next_save = csp.nodes_visited + every
+    while True:
+        solution: Optional[dict] = search.run(max(next_save - csp.nodes_visited, 0))
+        if solution is not None:
+            count += 1
+            if keep_solutions:
+                solutions.append(csp.label(solution))
+        elif search.done:
+            break
+        else:
+            save_checkpoint(path, {'version': CHECKPOINT_VERSION, 'instance': instance, 'count': count,
+                                   'solutions': solutions, 'search': search.save()})
+            next_save = csp.nodes_visited + every
+    if os.path.exists(path):
+        os.remove(path)
+    return count, solutions, csp.nodes_visited
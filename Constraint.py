@@ -1,5 +1,5 @@
 from abc import ABC, abstractmethod
-from typing import Generic, TypeVar, Dict, List
+from typing import Generic, TypeVar, Dict, List, Optional
 
 V = TypeVar('V')  # variable type
 D = TypeVar('D')  # domain type
@@ -7,6 +7,24 @@ D = TypeVar('D')  # domain type
 
 # Base class for all constraints
 class Constraint(Generic[V, D], ABC):
+    # Models create thousands of constraints, subclasses declare their attributes in
+    # __slots__ as well so none of them carries a __dict__
+    __slots__ = ('variables',)
+
+    # Propagating constraints prune the domains of their variables themselves during
+    # arc consistency instead of being revised one variable at a time
+    propagates = False
+
+    # Pairwise constraints forbid pairs of values only: satisfied_by(variable) fails exactly
+    # when the value of variable clashes with the value of one other assigned variable, as
+    # with all-different or an inequality. Which values of one variable a value of another
+    # allows is then fixed, and forward checking with the bitset store looks it up as a mask
+    pairwise = False
+
+    # Stateful constraints keep state of the search they take part in, a clone of the CSP
+    # gets a fresh() copy of them while the other constraints are shared between clones
+    stateful = False
+
     # The variables that the constraint is between
     def __init__(self, variables: List[V]) -> None:
         self.variables = variables
@@ -15,3 +33,26 @@ class Constraint(Generic[V, D], ABC):
     @abstractmethod
     def satisfied(self, assignment: Dict[V, D]) -> bool:
         ...
+
+    # Check only what the value just given to variable can break, assuming the rest of the
+    # assignment is already consistent. Defaults to a full check, constraints override it
+    # to look at their own variables only
+    def satisfied_by(self, variable: V, assignment: Dict[V, D]) -> bool:
+        return self.satisfied(assignment)
+
+    # Assigned variables that together with variable make the constraint fail, used as the
+    # conflict set by backjumping. Defaults to the whole assigned scope, constraints
+    # override it to name only the variables actually involved
+    def explain(self, variable: V, assignment: Dict[V, D]) -> List[V]:
+        return [other for other in self.variables if other != variable and other in assignment]
+
+    # Copy to use in another CSP with the state of the search started over, only called on
+    # constraints that set stateful
+    def fresh(self) -> 'Constraint[V, D]':
+        return self
+
+    # Prune the domains of the unassigned variables through csp.restrict; returns the
+    # variables whose domains changed, or None when one of them is wiped out.
+    # Only called on constraints that set propagates
+    def propagate(self, csp, assignment: Dict[V, D]) -> Optional[List[V]]:
+        return []
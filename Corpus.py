@@ -0,0 +1,241 @@
+import argparse
+import mmap
+import os
+import struct
+import sys
+from typing import Iterable, Iterator, List, NamedTuple
+
+from CSP import Grid
+from utils import read_grid_from_file
+
+# Corpus files hold many puzzles, each a record of its name, kind, size and grid. Text
+# corpora give every record a header line "<kind> <n> <name>" followed by the lines of
+# the grid as in binary-futoshiki_dane_v1.0; lines starting with # are comments. Binary
+# corpora start with BINARY_MAGIC and pack the grids: 2 bits per cell of a Binary grid,
+# the digits of a Futoshiki grid in as few bits as n needs followed by 2 bits per
+# inequality slot
+
+KINDS = ('binary', 'futoshiki')
+TEXT_HEADER = '# corpus 1\n'
+BINARY_MAGIC = b'CSPCORP1'
+# header of a binary record: kind, n, bytes of the name, bytes of the packed grid
+RECORD = struct.Struct('<BBHI')
+
+# 2-bit codes of the cells of a Binary grid and of the inequality slots of a Futoshiki grid
+CELL_CODES = {'x': 0, '0': 1, '1': 2}
+RELATION_CODES = {'-': 0, '>': 1, '<': 2}
+CELLS = {code: cell for cell, code in CELL_CODES.items()}
+RELATIONS = {code: relation for relation, code in RELATION_CODES.items()}
+
+
+class Puzzle(NamedTuple):
+    name: str
+    kind: str  # one of KINDS
+    n: int
+    grid: Grid
+
+
+# Lines a grid of the kind takes: Futoshiki grids interleave rows of fields with rows of
+# vertical inequalities
+def grid_lines(kind: str, n: int) -> int:
+    return n if kind == 'binary' else 2 * n - 1
+
+
+# Kind and size of a grid in the format of binary-futoshiki_dane_v1.0
+def detect(grid: Grid) -> tuple[str, int]:
+    lines = len(grid)
+    if lines and all(len(row) == lines and set(row) <= set(CELL_CODES) for row in grid):
+        return 'binary', lines
+    n = (lines + 1) // 2
+    if lines % 2 == 1 and all(len(row) == (2 * n - 1 if i % 2 == 0 else n) for i, row in enumerate(grid)):
+        return 'futoshiki', n
+    raise ValueError("Not a Binary or Futoshiki grid")
+
+
+def pack(codes: List[int], width: int) -> bytes:
+    bits = 0
+    for i, code in enumerate(codes):
+        bits |= code << (i * width)
+    return bits.to_bytes((len(codes) * width + 7) // 8, 'little')
+
+
+def unpack(data: bytes, count: int, width: int) -> List[int]:
+    bits = int.from_bytes(data, 'little')
+    mask = (1 << width) - 1
+    return [bits >> (i * width) & mask for i in range(count)]
+
+
+def encode_grid(kind: str, n: int, grid: Grid) -> bytes:
+    try:
+        if kind == 'binary':
+            if len(grid) != n or any(len(row) != n for row in grid):
+                raise ValueError
+            return pack([CELL_CODES[cell] for row in grid for cell in row], 2)
+        cells = [0 if cell == 'x' else int(cell) for row in grid[::2] for cell in row[::2]]
+        relations = [RELATION_CODES[x] for row in grid[::2] for x in row[1::2]]
+        relations += [RELATION_CODES[x] for row in grid[1::2] for x in row]
+    except (KeyError, ValueError):
+        raise ValueError("Invalid cell in " + kind + " grid") from None
+    if len(cells) != n * n or len(relations) != 2 * n * (n - 1) or max(cells, default=0) > n:
+        raise ValueError("Invalid futoshiki grid")
+    return pack(cells, n.bit_length()) + pack(relations, 2)
+
+
+def decode_grid(kind: str, n: int, data: bytes) -> Grid:
+    if kind == 'binary':
+        codes = unpack(data, n * n, 2)
+        return [[CELLS[code] for code in codes[i * n:(i + 1) * n]] for i in range(n)]
+    width = n.bit_length()
+    split = (n * n * width + 7) // 8
+    cells = [str(value) if value else 'x' for value in unpack(data[:split], n * n, width)]
+    codes = unpack(data[split:], 2 * n * (n - 1), 2)
+    horizontal, vertical = codes[:n * (n - 1)], codes[n * (n - 1):]
+    grid = []
+    for i in range(n):
+        row = [cells[i * n]]
+        for j in range(1, n):
+            row.append(RELATIONS[horizontal[i * (n - 1) + j - 1]])
+            row.append(cells[i * n + j])
+        grid.append(row)
+        if i < n - 1:
+            grid.append([RELATIONS[code] for code in vertical[i * n:(i + 1) * n]])
+    return grid
+
+
+# Yield the puzzles of a text or binary corpus one by one, reading the file through a
+# memory map so only the record being parsed is copied out of it
+def iter_corpus(path: str) -> Iterator[Puzzle]:
+    with open(path, 'rb') as file:
+        if os.fstat(file.fileno()).st_size == 0:
+            return
+        with mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ) as data:
+            if data[:len(BINARY_MAGIC)] == BINARY_MAGIC:
+                yield from read_binary(data)
+            else:
+                yield from read_text(data)
+
+
+def read_text(data: mmap.mmap) -> Iterator[Puzzle]:
+    while True:
+        line = data.readline()
+        if not line:
+            return
+        line = line.decode('ascii').strip()
+        if not line or line.startswith('#'):
+            continue
+        fields = line.split(maxsplit=2)
+        if len(fields) < 2 or fields[0] not in KINDS or not fields[1].isdigit():
+            raise ValueError("Invalid corpus record header: " + line)
+        kind, n = fields[0], int(fields[1])
+        name = fields[2] if len(fields) > 2 else ''
+        grid = [list(data.readline().decode('ascii').rstrip('\r\n')) for _ in range(grid_lines(kind, n))]
+        if detect(grid) != (kind, n):
+            raise ValueError("Grid of " + (name or kind) + " does not match its header")
+        yield Puzzle(name, kind, n, grid)
+
+
+def read_binary(data: mmap.mmap) -> Iterator[Puzzle]:
+    offset = len(BINARY_MAGIC)
+    while offset < len(data):
+        if offset + RECORD.size > len(data):
+            raise ValueError("Truncated corpus record")
+        kind, n, name_size, grid_size = RECORD.unpack_from(data, offset)
+        offset += RECORD.size
+        if kind >= len(KINDS) or offset + name_size + grid_size > len(data):
+            raise ValueError("Invalid corpus record")
+        name = data[offset:offset + name_size].decode('utf-8')
+        offset += name_size
+        grid = decode_grid(KINDS[kind], n, data[offset:offset + grid_size])
+        offset += grid_size
+        yield Puzzle(name, KINDS[kind], n, grid)
+
+
+# Write puzzles to a corpus, packed when binary; returns the number of puzzles written
+def write_corpus(path: str, puzzles: Iterable[Puzzle], binary: bool = False) -> int:
+    count = 0
+    with open(path, 'wb') as file:
+        file.write(BINARY_MAGIC if binary else TEXT_HEADER.encode('ascii'))
+        for puzzle in puzzles:
+            if binary:
+                name = puzzle.name.encode('utf-8')
+                grid = encode_grid(puzzle.kind, puzzle.n, puzzle.grid)
+                file.write(RECORD.pack(KINDS.index(puzzle.kind), puzzle.n, len(name), len(grid)) + name + grid)
+            else:
+                rows = ''.join(''.join(row) + '\n' for row in puzzle.grid)
+                file.write(('%s %d %s\n' % (puzzle.kind, puzzle.n, puzzle.name) + rows).encode('ascii'))
+            count += 1
+    return count
+
+
+# A puzzle file of binary-futoshiki_dane_v1.0, its kind and size taken from the grid
+def read_puzzle(path: str) -> Puzzle:
+    grid = [row for row in read_grid_from_file(path) if row]
+    kind, n = detect(grid)
+    return Puzzle(os.path.basename(path), kind, n, grid)
+
+
+# The puzzle files of a directory in the format of binary-futoshiki_dane_v1.0, skipping
+# the files that are not grids
+def read_dataset(directory: str) -> Iterator[Puzzle]:
+    for name in sorted(os.listdir(directory)):
+        path = os.path.join(directory, name)
+        if not os.path.isfile(path):
+            continue
+        try:
+            yield read_puzzle(path)
+        except (ValueError, UnicodeDecodeError):
+            continue
+
+
+# Whether a file is a corpus rather than a single puzzle file
+def is_corpus(path: str) -> bool:
+    with open(path, 'rb') as file:
+        first = file.readline(256)
+    fields = first.split()
+    return first.startswith(BINARY_MAGIC) or first.startswith(b'#') or (
+            len(fields) >= 2 and fields[0].decode('ascii', 'replace') in KINDS)
+
+
+# Puzzles of a mix of sources: directories of puzzle files, corpora and puzzle files
+def iter_puzzles(sources: Iterable[str]) -> Iterator[Puzzle]:
+    for source in sources:
+        if os.path.isdir(source):
+            yield from read_dataset(source)
+        elif is_corpus(source):
+            yield from iter_corpus(source)
+        else:
+            yield read_puzzle(source)
+
+
+def convert(args) -> int:
+    count = write_corpus(args.out, iter_puzzles(args.sources), args.binary)
+    print('%d puzzles written to %s' % (count, args.out))
+    return 0
+
+
+def show(args) -> int:
+    for puzzle in iter_corpus(args.corpus):
+        print(puzzle.kind, puzzle.n, puzzle.name)
+    return 0
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description='Build and inspect puzzle corpora')
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    convert_parser = commands.add_parser('convert', help='collect puzzle files and corpora into a corpus')
+    convert_parser.add_argument('sources', nargs='+', help='puzzle files, corpora or directories of puzzle files')
+    convert_parser.add_argument('--out', required=True)
+    convert_parser.add_argument('--binary', action='store_true', help='write the packed binary encoding')
+    convert_parser.set_defaults(handler=convert)
+
+    list_parser = commands.add_parser('list', help='list the puzzles of a corpus')
+    list_parser.add_argument('corpus')
+    list_parser.set_defaults(handler=show)
+
+    args = parser.parse_args(argv)
+    return args.handler(args)
+
+
+if __name__ == '__main__':
+    sys.exit(main())
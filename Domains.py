@@ -0,0 +1,125 @@
+from typing import Generic, TypeVar, Dict, List, Iterator, Sequence
+
+V = TypeVar('V')  # variable type
+D = TypeVar('D')  # domain type
+
+# Masks of universes up to this many values are decoded once and reused
+DECODE_CACHE_BITS = 16
+
+
+# Default domain store: a plain dict of lists with the store operations on top
+class ListDomains(Dict[V, List[D]]):
+    def size(self, variable: V) -> int:
+        return len(self[variable])
+
+    def contains(self, variable: V, value: D) -> bool:
+        return value in self[variable]
+
+    def remove(self, variable: V, value: D) -> None:
+        # copy on write, the old list may still be referenced by the trail
+        self[variable] = [x for x in self[variable] if x != value]
+
+    # Opaque snapshot of one domain, cheap to take and to load back
+    def save(self, variable: V) -> List[D]:
+        return self[variable]
+
+    def load(self, variable: V, state: List[D]) -> None:
+        self[variable] = state
+
+    # Independent store, domains are never changed in place so the lists are shared
+    def copy(self) -> 'ListDomains[V, D]':
+        return ListDomains(self)
+
+
+# Opt-in domain store packing every domain into an int bitmask, bit i standing for
+# the i-th value of the universe (the union of all domains in first-seen order)
+class BitsetDomains(Generic[V, D]):
+    def __init__(self, domains: Dict[V, Sequence[D]]) -> None:
+        self.universe: List[D] = []
+        self.bits: Dict[D, int] = {}
+        for domain in domains.values():
+            for value in domain:
+                if value not in self.bits:
+                    self.bits[value] = 1 << len(self.universe)
+                    self.universe.append(value)
+        self.masks: Dict[V, int] = {variable: self.encode(domain) for variable, domain in domains.items()}
+        self.full = (1 << len(self.universe)) - 1
+        self.decoded: Dict[int, tuple[D, ...]] = {}
+        self.decoded_entries: Dict[int, tuple[tuple[D, int], ...]] = {}
+
+    def encode(self, values: Sequence[D]) -> int:
+        mask = 0
+        for value in values:
+            mask |= self.bits[value]
+        return mask
+
+    def decode(self, mask: int) -> tuple[D, ...]:
+        if mask in self.decoded:
+            return self.decoded[mask]
+        values = []
+        rest = mask
+        while rest:
+            low = rest & -rest
+            values.append(self.universe[low.bit_length() - 1])
+            rest ^= low
+        values = tuple(values)
+        if len(self.universe) <= DECODE_CACHE_BITS:
+            self.decoded[mask] = values
+        return values
+
+    # (value, bit) pairs of a mask in universe order, for filtering a domain bit by bit
+    def entries(self, mask: int) -> tuple[tuple[D, int], ...]:
+        if mask in self.decoded_entries:
+            return self.decoded_entries[mask]
+        entries = tuple((value, self.bits[value]) for value in self.decode(mask))
+        if len(self.universe) <= DECODE_CACHE_BITS:
+            self.decoded_entries[mask] = entries
+        return entries
+
+    # Values of a domain in universe order
+    def __getitem__(self, variable: V) -> tuple[D, ...]:
+        return self.decode(self.masks[variable])
+
+    def __setitem__(self, variable: V, values: Sequence[D]) -> None:
+        self.masks[variable] = self.encode(values)
+
+    def __contains__(self, variable: V) -> bool:
+        return variable in self.masks
+
+    def __iter__(self) -> Iterator[V]:
+        return iter(self.masks)
+
+    def __len__(self) -> int:
+        return len(self.masks)
+
+    def keys(self):
+        return self.masks.keys()
+
+    def items(self):
+        return ((variable, self.decode(mask)) for variable, mask in self.masks.items())
+
+    def size(self, variable: V) -> int:
+        return self.masks[variable].bit_count()
+
+    def contains(self, variable: V, value: D) -> bool:
+        return bool(self.masks[variable] & self.bits.get(value, 0))
+
+    def remove(self, variable: V, value: D) -> None:
+        self.masks[variable] &= ~self.bits.get(value, 0)
+
+    def save(self, variable: V) -> int:
+        return self.masks[variable]
+
+    def load(self, variable: V, state: int) -> None:
+        self.masks[variable] = state
+
+    # Independent store sharing the universe and the decoded masks
+    def copy(self) -> 'BitsetDomains[V, D]':
+        other = BitsetDomains.__new__(BitsetDomains)
+        other.universe = self.universe
+        other.bits = self.bits
+        other.masks = dict(self.masks)
+        other.full = self.full
+        other.decoded = self.decoded
+        other.decoded_entries = self.decoded_entries
+        return other
@@ -0,0 +1,160 @@
+from typing import List, Optional
+
+
+# Open node of the iterative search: the variable branched on, its values in the order
+# they are tried, how many were tried and whether the last one is still assigned
+class ChoicePoint:
+    __slots__ = ('variable', 'values', 'index', 'assigned', 'mark', 'depth', 'found')
+
+    def __init__(self, variable, values: list, depth: int) -> None:
+        self.variable = variable
+        self.values = values
+        self.index = 0
+        self.assigned = False
+        self.mark = 0  # trail length before the current value was propagated
+        self.depth = depth
+        self.found = 0  # solutions counted by the stats before the current value was assigned
+
+
+# Trail search driven by an explicit stack of choice points instead of recursion, so
+# the depth of the search is not bounded by the recursion limit. It visits the nodes of
+# the recursive trail search in the same order (BT, FC or MAC depending on the
+# propagators) and counts them the same way. The search is an iterator of solutions
+# that can be left at any point and resumed later; run(max_nodes) also pauses it in the
+# middle of a subtree. close() restores the domains
+class IterativeSearch:
+    def __init__(self, csp, assignment=None, forward_checking=False, mac=False, MRV=False, LSC=False) -> None:
+        self.csp = csp
+        self.root, self.propagate = csp.propagators(forward_checking, mac)
+        self.assignment = dict(assignment) if assignment is not None else {}
+        self.MRV = MRV
+        self.LSC = LSC
+        self.stack: List[ChoicePoint] = []
+        self.base = len(csp.trail)
+        self.started = False
+        self.done = False
+
+    def __iter__(self):
+        return self
+
+    def __next__(self) -> dict:
+        solution = self.run()
+        if solution is None:
+            raise StopIteration
+        return solution
+
+    # Search until the next solution and return it; returns None when the search space is
+    # exhausted (done is then set) or after max_nodes more nodes, to be resumed later
+    def run(self, max_nodes: Optional[int] = None) -> Optional[dict]:
+        if self.done:
+            return None
+        csp = self.csp
+        assignment = self.assignment
+        if not self.started:
+            self.started = True
+            if not self.root(assignment):
+                self.close()
+                return None
+            if len(assignment) == len(csp.variables):
+                solution = assignment.copy()
+                self.close()
+                return solution
+            self.stack.append(self.open())
+        limit = None if max_nodes is None else csp.nodes_visited + max_nodes
+        stack = self.stack
+        while stack:
+            point = stack[-1]
+            if point.assigned:
+                self.retract(point)
+            if point.index == len(point.values):
+                stack.pop()
+                continue
+            if limit is not None and csp.nodes_visited >= limit:
+                return None
+            if csp.next_check is not None and csp.nodes_visited >= csp.next_check:
+                csp.check_limit()
+            variable = point.variable
+            value = point.values[point.index]
+            point.index += 1
+            csp.nodes_visited += 1
+            if csp.stats is not None:
+                csp.stats.assigned(variable, value, point.depth)
+                point.found = csp.stats.solutions
+            assignment[variable] = value
+            point.mark = len(csp.trail)
+            point.assigned = True
+            if not csp.consistent(variable, assignment):
+                if csp.ordering is not None:
+                    csp.ordering.failed(csp.violated(variable, assignment))
+                continue
+            if not self.propagate(variable, assignment, None):
+                continue
+            if len(assignment) == len(csp.variables):
+                return assignment.copy()
+            stack.append(self.open())
+        self.close()
+        return None
+
+    # Choice point for the next variable of the current assignment
+    def open(self) -> ChoicePoint:
+        first, _ = self.csp.next_variable(self.assignment, self.MRV)
+        return ChoicePoint(first, self.csp.value_order(first, self.assignment, self.LSC), len(self.assignment))
+
+    # Take back the value currently assigned at a choice point and what it propagated,
+    # counted as a backtrack unless a solution was found below it or the search is abandoned
+    def retract(self, point: ChoicePoint, abandoned: bool = False) -> None:
+        csp = self.csp
+        csp.undo(point.mark)
+        del self.assignment[point.variable]
+        point.assigned = False
+        if csp.ordering is not None:
+            csp.ordering.unassigned(point.variable)
+        if csp.stats is not None and not abandoned and csp.stats.solutions == point.found:
+            csp.stats.backtracked(point.variable, point.depth)
+
+    # State of a paused search that load() can continue on an identically built CSP:
+    # choice points, assignment, domains, trail and node count, with variables given by
+    # their index in csp.variables
+    def save(self) -> dict:
+        csp = self.csp
+        index = csp.index
+        return {
+            'started': self.started,
+            'done': self.done,
+            'assignment': [(index[variable], value) for variable, value in self.assignment.items()],
+            'points': [(index[point.variable], point.values, point.index, point.assigned, point.mark - self.base,
+                        point.depth) for point in self.stack],
+            'domains': [csp.domains.save(variable) for variable in csp.variables],
+            'trail': [(index[variable], state) for variable, state in csp.trail[self.base:]],
+            'nodes_visited': csp.nodes_visited,
+            'ordering': csp.ordering.save() if csp.ordering is not None else None,
+        }
+
+    # Continue from a state returned by save(), in place of the start assignment
+    def load(self, state: dict) -> None:
+        csp = self.csp
+        variables = csp.variables
+        self.started = state['started']
+        self.done = state['done']
+        self.assignment = {variables[i]: value for i, value in state['assignment']}
+        for variable, domain in zip(variables, state['domains']):
+            csp.domains.load(variable, domain)
+        csp.trail.extend((variables[i], domain) for i, domain in state['trail'])
+        self.stack = []
+        for i, values, index, assigned, mark, depth in state['points']:
+            point = ChoicePoint(variables[i], values, depth)
+            point.index, point.assigned, point.mark = index, assigned, mark + self.base
+            self.stack.append(point)
+        csp.nodes_visited = state['nodes_visited']
+        csp.schedule_check()
+        if csp.ordering is not None and state['ordering'] is not None:
+            csp.ordering.load(state['ordering'])
+
+    # Abandon the search, restoring the domains and the start assignment
+    def close(self) -> None:
+        while self.stack:
+            point = self.stack.pop()
+            if point.assigned:
+                self.retract(point, abandoned=True)
+        self.csp.undo(self.base)
+        self.done = True
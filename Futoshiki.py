@@ -1,14 +1,18 @@
 import itertools
 from typing import List, Dict
 from CSP import CSP, Constraint, Problem, Grid
+from AllDifferent import AllDifferentConstraint
 
 
-class RowsConstraint(Constraint[tuple[int, int], int]):
-    def __init__(self, variables: List[tuple[int, int]]) -> None:
+class RowsConstraint(Constraint[int, int]):
+    __slots__ = ()
+    pairwise = True
+
+    def __init__(self, variables: List[int]) -> None:
         super().__init__(variables)
-        self.variables: List[tuple[int, int]] = variables
+        self.variables: List[int] = variables
 
-    def satisfied(self, assignment: Dict[tuple[int, int], List[int]]) -> bool:
+    def satisfied(self, assignment: Dict[int, List[int]]) -> bool:
         # print(assignment)
         keys = assignment.keys()
         # if all(elem in keys for elem in self.variables):
@@ -20,13 +24,28 @@ class RowsConstraint(Constraint[tuple[int, int], int]):
             return False
         return True
 
+    def satisfied_by(self, variable: int, assignment: Dict[int, int]) -> bool:
+        # only the new value can clash with the rest of the row
+        value = assignment[variable]
+        for other in self.variables:
+            if other != variable and other in assignment and assignment[other] == value:
+                return False
+        return True
+
+    def explain(self, variable: int, assignment: Dict[int, int]) -> List[int]:
+        value = assignment[variable]
+        return [other for other in self.variables if other != variable and assignment.get(other) == value]
+
 
-class ColumnsConstraint(Constraint[tuple[int, int], int]):
-    def __init__(self, variables: List[tuple[int, int]]) -> None:
+class ColumnsConstraint(Constraint[int, int]):
+    __slots__ = ()
+    pairwise = True
+
+    def __init__(self, variables: List[int]) -> None:
         super().__init__(variables)
-        self.variables: List[tuple[int, int]] = variables
+        self.variables: List[int] = variables
 
-    def satisfied(self, assignment: Dict[tuple[int, int], List[int]]) -> bool:
+    def satisfied(self, assignment: Dict[int, List[int]]) -> bool:
         keys = assignment.keys()
         # if all(elem in keys for elem in self.variables):
         column = []
@@ -37,20 +56,39 @@ class ColumnsConstraint(Constraint[tuple[int, int], int]):
             return False
         return True
 
+    def satisfied_by(self, variable: int, assignment: Dict[int, int]) -> bool:
+        # only the new value can clash with the rest of the column
+        value = assignment[variable]
+        for other in self.variables:
+            if other != variable and other in assignment and assignment[other] == value:
+                return False
+        return True
+
+    def explain(self, variable: int, assignment: Dict[int, int]) -> List[int]:
+        value = assignment[variable]
+        return [other for other in self.variables if other != variable and assignment.get(other) == value]
+
 
-class FutoshikiConstraint(Constraint[tuple[int, int], int]):
-    def __init__(self, grt_field: tuple[int, int], ls_field: tuple[int, int]) -> None:
+class FutoshikiConstraint(Constraint[int, int]):
+    __slots__ = ('grt_field', 'ls_field')
+    pairwise = True
+
+    def __init__(self, grt_field: int, ls_field: int) -> None:
         super().__init__([grt_field, ls_field])
-        self.grt_field: tuple[int, int] = grt_field
-        self.ls_field: tuple[int, int] = ls_field
+        self.grt_field: int = grt_field
+        self.ls_field: int = ls_field
 
-    def satisfied(self, assignment: Dict[tuple[int, int], List[int]]) -> bool:
+    def satisfied(self, assignment: Dict[int, List[int]]) -> bool:
         # check if grt_field > ls_field
         if self.grt_field in assignment and self.ls_field in assignment:
             if assignment[self.grt_field] <= assignment[self.ls_field]:
                 return False
         return True
 
+    def satisfied_by(self, variable: int, assignment: Dict[int, int]) -> bool:
+        # the full check only looks at the two fields already
+        return self.satisfied(assignment)
+
 
 def generate_lines(n: int):
     rows, columns = [], []
@@ -58,41 +96,51 @@ def generate_lines(n: int):
         row = []
         column = []
         for j in range(n):
-            row.append((i, j))
-            column.append((j, i))
+            row.append(i * n + j)
+            column.append(j * n + i)
         rows.append(row)
         columns.append(column)
     return rows, columns
 
 
-# Base class for all problems
+# Fields are numbered row by row, field (i, j) is variable i * n + j; solutions are
+# given back with (i, j) keys
 class Futoshiki(Problem):
-    # Solutions for problem
-    def __init__(self, MRV, LSC) -> None:
-        super().__init__()
-        self.MRV = MRV
-        self.LSC = LSC
-
-    def solve(self, n: int, grid: Grid, to_first_solution: bool, forward_checking: bool):
-        variables: List[tuple[int, int]] = list(itertools.product(list(range(n)), list(range(n))))
+    # alldifferent: None keeps the pairwise row and column constraints, 'regin' or 'bounds'
+    # replaces them with AllDifferent constraints that propagate under MAC and preprocessing
+    def __init__(self, MRV=False, LSC=False, alldifferent=None, **options) -> None:
+        super().__init__(MRV, LSC, **options)
+        self.alldifferent = alldifferent
+
+    def template_key(self, n: int) -> tuple:
+        return super().template_key(n) + (self.alldifferent,)
+
+    # The rows and columns are the same for every grid of a size, the inequalities and
+    # the givens are bound per grid
+    def compile(self, n: int) -> CSP:
+        variables: List[int] = list(range(n * n))
         domains = self.generate_domains(n)
-        csp: CSP[tuple[int, int], int] = CSP(variables, domains)
-
-        self.define_futoshiki_constraints(grid, csp)
+        csp: CSP[int, int] = CSP(variables, domains, bitset=self.bitset,
+                                 labels=list(itertools.product(range(n), range(n))))
 
         rows, columns = generate_lines(n)
-        for row in rows:
-            csp.add_constraint(RowsConstraint(row))
-        for column in columns:
-            csp.add_constraint(ColumnsConstraint(column))
+        if self.alldifferent:
+            for line in rows + columns:
+                csp.add_constraint(AllDifferentConstraint(line, bounds=self.alldifferent == 'bounds'))
+        else:
+            for row in rows:
+                csp.add_constraint(RowsConstraint(row))
+            for column in columns:
+                csp.add_constraint(ColumnsConstraint(column))
+        return csp
 
-        start_assignment = self.find_start_assignment(grid)
+    def bind(self, csp: CSP, grid: Grid) -> dict:
+        self.define_futoshiki_constraints(grid, csp)
+        return self.find_start_assignment(grid)
 
-        if forward_checking:
-            csp.forward_checking_search(start_assignment, to_first_solution=to_first_solution, MRV=self.MRV,
-                                        LSC=self.LSC)
-        else:
-            csp.backtracking_search(start_assignment, to_first_solution=to_first_solution, MRV=self.MRV, LSC=self.LSC)
+    def solve(self, n: int, grid: Grid, to_first_solution: bool, forward_checking: bool):
+        csp, start_assignment = self.build(n, grid)
+        self.search(csp, start_assignment, to_first_solution, forward_checking)
 
         first = 0
         if csp.solutions:
@@ -108,11 +156,11 @@ class Futoshiki(Problem):
         return n, first[1], csp.nodes_visited
 
     @staticmethod
-    def generate_domains(n: int) -> dict[(int, int), list[int]]:
+    def generate_domains(n: int) -> dict[int, list[int]]:
         domains = {}
         for i in range(n):
             for j in range(n):
-                domains[(i, j)] = list(range(1, n + 1))
+                domains[i * n + j] = list(range(1, n + 1))
         return domains
 
     @staticmethod
@@ -130,29 +178,31 @@ class Futoshiki(Problem):
                     if grid[i][j] == '>' or grid[i][j] == '<' or grid[i][j] == '-':
                         cosntr_col[int(i / 2)].append(grid[i][j])
 
+        n = len(cosntr_row)
         for i in range(len(cosntr_row)):
             for j in range(len(cosntr_row[i])):
                 if cosntr_row[i][j] == '>':
-                    csp.add_constraint(FutoshikiConstraint((i, j), (i, j + 1)))
+                    csp.add_constraint(FutoshikiConstraint(i * n + j, i * n + j + 1))
                 if cosntr_row[i][j] == '<':
-                    csp.add_constraint(FutoshikiConstraint((i, j + 1), (i, j)))
+                    csp.add_constraint(FutoshikiConstraint(i * n + j + 1, i * n + j))
 
         for i in range(len(cosntr_col)):
             for j in range(len(cosntr_col[i])):
                 if cosntr_col[i][j] == '>':
-                    csp.add_constraint(FutoshikiConstraint((i, j), (i + 1, j)))
+                    csp.add_constraint(FutoshikiConstraint(i * n + j, (i + 1) * n + j))
                 if cosntr_col[i][j] == '<':
-                    csp.add_constraint(FutoshikiConstraint((i + 1, j), (i, j)))
+                    csp.add_constraint(FutoshikiConstraint((i + 1) * n + j, i * n + j))
         return
 
     @staticmethod
     def find_start_assignment(grid):
+        n = (len(grid) + 1) // 2
         assignment = {}
         for i in range(len(grid)):
             if (i % 2) == 0:
                 for j in range(len(grid[i])):
                     if grid[i][j] != '>' and grid[i][j] != '<' and grid[i][j] != '-' and grid[i][j] != 'x':
-                        assignment[(int(i / 2), int(j / 2))] = int(grid[i][j])
+                        assignment[int(i / 2) * n + int(j / 2)] = int(grid[i][j])
         return assignment
 
 
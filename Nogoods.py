@@ -0,0 +1,41 @@
+from collections import OrderedDict
+from typing import Dict, FrozenSet, Optional, Set, Tuple
+
+Nogood = FrozenSet[Tuple]  # (variable, value) pairs that cannot all hold in a solution
+
+
+# Bounded store of nogoods learned by backjumping. The least recently used nogood is
+# evicted once capacity is exceeded. Every nogood is indexed under each of its pairs,
+# so a new assignment only has to look at the nogoods it can complete
+class NogoodStore:
+    def __init__(self, capacity: int) -> None:
+        self.capacity = capacity
+        self.nogoods: OrderedDict[Nogood, None] = OrderedDict()
+        self.index: Dict[Tuple, Set[Nogood]] = {}
+        self.hits = 0
+
+    def __len__(self) -> int:
+        return len(self.nogoods)
+
+    def add(self, nogood: Nogood) -> None:
+        if nogood in self.nogoods:
+            self.nogoods.move_to_end(nogood)
+            return
+        self.nogoods[nogood] = None
+        for pair in nogood:
+            self.index.setdefault(pair, set()).add(nogood)
+        if len(self.nogoods) > self.capacity:
+            evicted, _ = self.nogoods.popitem(last=False)
+            for pair in evicted:
+                self.index[pair].discard(evicted)
+                if not self.index[pair]:
+                    del self.index[pair]
+
+    # A stored nogood made complete by giving value to variable in assignment, or None
+    def match(self, variable, value, assignment: dict) -> Optional[Nogood]:
+        for nogood in self.index.get((variable, value), ()):
+            if all(other in assignment and assignment[other] == other_value for other, other_value in nogood):
+                self.nogoods.move_to_end(nogood)
+                self.hits += 1
+                return nogood
+        return None
@@ -0,0 +1,134 @@
+import heapq
+from typing import Dict, List, Optional
+
+
+# Variable ordering kept in a heap keyed on key(variable), smaller first, ties broken by
+# the position of the variable in csp.variables. The trail search keeps it up to date:
+# changed() when a domain shrinks or is restored, unassigned() when a variable is freed.
+# Stale entries stay in the heap and are skipped when they reach the top
+class VariableOrdering:
+    def __init__(self, csp) -> None:
+        self.csp = csp
+        self.index = dict(csp.index)
+        self.version: Dict = {}
+        self.heap: List[tuple] = []
+        self.assignment: Optional[dict] = None
+
+    # Smaller keys are selected first
+    def key(self, variable) -> tuple:
+        return ()
+
+    # Start tracking the unassigned variables of the live search assignment
+    def attach(self, assignment: dict) -> None:
+        self.assignment = assignment
+        self.version = dict.fromkeys(self.csp.variables, 0)
+        self.heap = [(self.key(v), self.index[v], 0, v) for v in self.csp.variables if v not in assignment]
+        heapq.heapify(self.heap)
+
+    def push(self, variable) -> None:
+        self.version[variable] += 1
+        heapq.heappush(self.heap, (self.key(variable), self.index[variable], self.version[variable], variable))
+        if len(self.heap) > 4 * len(self.version) + 64:
+            self.attach(self.assignment)
+
+    def changed(self, variable) -> None:
+        if self.assignment is not None and variable not in self.assignment:
+            self.push(variable)
+
+    def unassigned(self, variable) -> None:
+        if self.assignment is not None:
+            self.push(variable)
+
+    # Best unassigned variable of the live assignment
+    def best(self):
+        heap = self.heap
+        while True:
+            _, _, version, variable = heap[0]
+            if version == self.version[variable] and variable not in self.assignment:
+                return variable
+            heapq.heappop(heap)
+
+    # Linear scan over an explicit list, for the search modes that copy assignments
+    def select(self, unassigned: list):
+        return min(unassigned, key=lambda v: (self.key(v), self.index[v]))
+
+    # Break ties in a random order drawn from rng instead of the order of csp.variables
+    def shuffle(self, rng) -> None:
+        ranks = list(range(len(self.csp.variables)))
+        rng.shuffle(ranks)
+        self.index = dict(zip(self.csp.variables, ranks))
+        self.assignment = None
+
+    # A constraint failed a consistency check or wiped out a domain
+    def failed(self, constraint) -> None:
+        pass
+
+    # Drop what was learned from failures
+    def forget(self) -> None:
+        pass
+
+    # What was learned from failures, for load() on an identically built CSP
+    def save(self):
+        return None
+
+    def load(self, state) -> None:
+        pass
+
+
+# Static order of csp.variables
+class FirstOrdering(VariableOrdering):
+    pass
+
+
+# Minimum remaining values
+class MRVOrdering(VariableOrdering):
+    def key(self, variable) -> tuple:
+        return (self.csp.domains.size(variable),)
+
+
+# Minimum remaining values, ties broken by the larger number of neighbours
+class MRVDegreeOrdering(VariableOrdering):
+    def __init__(self, csp) -> None:
+        super().__init__(csp)
+        self.degree = {variable: len(csp.neighbours(variable)) for variable in csp.variables}
+
+    def key(self, variable) -> tuple:
+        return (self.csp.domains.size(variable), -self.degree[variable])
+
+
+# Domain size over weighted degree: every failure of a constraint bumps its weight,
+# so variables involved in many conflicts are tried earlier
+class DomWdegOrdering(VariableOrdering):
+    def __init__(self, csp) -> None:
+        super().__init__(csp)
+        self.forget()
+
+    def key(self, variable) -> tuple:
+        return (self.csp.domains.size(variable) / max(self.wdeg[variable], 1),)
+
+    def failed(self, constraint) -> None:
+        self.weights[constraint] += 1
+        for variable in self.csp.constr_map_variable[constraint]:
+            self.wdeg[variable] += 1
+            self.changed(variable)
+
+    def forget(self) -> None:
+        self.load([1] * len(self.csp.constr_map_variable))
+
+    # constraint weights in the order the constraints were added
+    def save(self) -> list:
+        return list(self.weights.values())
+
+    def load(self, state: list) -> None:
+        self.weights = dict(zip(self.csp.constr_map_variable, state))
+        self.wdeg = {variable: sum(self.weights[c] for c in self.csp.constraints[variable])
+                     for variable in self.csp.variables}
+        self.assignment = None
+
+
+ORDERINGS = {
+    'first': FirstOrdering,
+    'mrv': MRVOrdering,
+    'mrv-degree': MRVDegreeOrdering,
+    'dom/wdeg': DomWdegOrdering,
+}
@@ -0,0 +1,175 @@
+import multiprocessing
+import os
+import queue
+import time
+from concurrent.futures import ProcessPoolExecutor, wait, FIRST_COMPLETED
+from typing import Dict, List, Optional
+
+from CSP import CSP, Problem, Grid
+
+# Seconds between two looks at whether the racing processes are still alive
+RACE_POLL_INTERVAL = 0.1
+
+# Worker state: the CSP built once per process and the flag telling it to give work away
+_worker: Dict[str, object] = {}
+
+
+def init_worker(problem: Problem, n: int, grid: Grid, hungry) -> None:
+    csp, assignment = problem.build(n, grid)
+    problem.prepare(csp, assignment)
+    _worker['problem'] = problem
+    _worker['csp'] = csp
+    _worker['hungry'] = hungry
+
+
+# Search one subproblem (assignment, domains of the unassigned variables). Its children
+# are searched one after the other; when some worker sits idle the children not started
+# yet are handed back to be scheduled elsewhere.
+# Returns (solutions found, their number, nodes visited, handed back subproblems)
+def run_subproblem(task: tuple[dict, dict], forward_checking: bool, count_only: bool):
+    problem: Problem = _worker['problem']
+    csp: CSP = _worker['csp']
+    hungry = _worker['hungry']
+    assignment, domains = task
+    csp.nodes_visited = 0
+    solutions, count = [], 0
+    if len(assignment) == len(csp.variables):
+        return ([] if count_only else [csp.label(assignment)]), 1, 0, []
+
+    csp.load_snapshot(domains)
+    _, propagate = csp.propagators(forward_checking, problem.mac)
+    children = []
+    for _ in csp.branches(assignment, propagate, problem.MRV, problem.LSC):
+        children.append((assignment.copy(), csp.snapshot(assignment)))
+
+    for i, (child, child_domains) in enumerate(children):
+        if i > 0 and hungry.is_set():
+            return solutions, count, csp.nodes_visited, children[i:]
+        csp.load_snapshot(child_domains)
+        for solution in csp.iter_solutions(child, forward_checking=forward_checking, MRV=problem.MRV,
+                                           LSC=problem.LSC, trail=True, mac=problem.mac):
+            count += 1
+            if not count_only:
+                solutions.append(csp.label(solution))
+    return solutions, count, csp.nodes_visited, []
+
+
+# Split the search tree at split_depth into subproblems, taken from the configured
+# search mode of problem (forward checking always runs in trail mode here)
+def split(problem: Problem, csp: CSP, assignment: dict, forward_checking: bool,
+          split_depth: int) -> List[tuple[dict, dict]]:
+    assignment = dict(assignment)
+    root, propagate = csp.propagators(forward_checking, problem.mac)
+    tasks = []
+
+    def descend(depth: int) -> None:
+        if depth == split_depth or len(assignment) == len(csp.variables):
+            tasks.append((assignment.copy(), csp.snapshot(assignment)))
+            return
+        for _ in csp.branches(assignment, propagate, problem.MRV, problem.LSC):
+            descend(depth + 1)
+
+    mark = len(csp.trail)
+    if root(assignment):
+        descend(0)
+    csp.undo(mark)
+    return tasks
+
+
+# Exhaustive search of a grid on a process pool. The tree is split at split_depth into
+# independent subproblems, at most one per worker is in flight and idle workers make the
+# busy ones hand back work. Returns (number of solutions, solutions, nodes visited);
+# solutions come in completion order and are not kept with count_only
+def parallel_search(problem: Problem, n: int, grid: Grid, forward_checking: bool, processes: Optional[int] = None,
+                    split_depth: int = 2, count_only: bool = False) -> tuple[int, list, int]:
+    processes = processes or os.cpu_count() or 1
+    csp, assignment = problem.build(n, grid)
+    if not problem.prepare(csp, assignment):
+        return 0, [], 0
+    pending = split(problem, csp, assignment, forward_checking, split_depth)
+    nodes_visited = csp.nodes_visited
+    solutions, count = [], 0
+
+    with multiprocessing.Manager() as manager:
+        hungry = manager.Event()
+        with ProcessPoolExecutor(processes, initializer=init_worker,
+                                 initargs=(problem, n, grid, hungry)) as executor:
+            running = set()
+            while pending or running:
+                while pending and len(running) < processes:
+                    running.add(executor.submit(run_subproblem, pending.pop(), forward_checking, count_only))
+                if not pending and len(running) < processes:
+                    hungry.set()
+                else:
+                    hungry.clear()
+                done, running = wait(running, return_when=FIRST_COMPLETED)
+                for future in done:
+                    found, found_count, nodes, handed_back = future.result()
+                    solutions.extend(found)
+                    count += found_count
+                    nodes_visited += nodes
+                    pending.extend(handed_back)
+    return count, solutions, nodes_visited
+
+
+# Default portfolio for a problem class: BT and FC, each with MRV, LSC and both
+def default_portfolio(problem_class) -> List[tuple[Problem, bool]]:
+    return [(problem_class(MRV, LSC, trail=forward_checking), forward_checking)
+            for forward_checking in (False, True) for MRV, LSC in ((True, False), (False, True), (True, True))]
+
+
+def race_worker(index: int, problem: Problem, n: int, grid: Grid, forward_checking: bool, results) -> None:
+    try:
+        csp, assignment = problem.build(n, grid)
+        solution = next(problem.stream(csp, assignment, forward_checking, 1), None)
+    except Exception as error:
+        # reported as text, the exception itself may not pickle
+        results.put((index, None, 0, '%s: %s' % (type(error).__name__, error)))
+        return
+    results.put((index, solution, csp.nodes_visited, None))
+
+
+# Race several (problem, forward_checking) configurations on one grid, each in its own
+# process. The first one to finish wins, the others are terminated. Returns (index of
+# the winning configuration, its solution or None if the grid has none, nodes it
+# visited); the index is None when nothing finished within timeout seconds. Raises
+# RuntimeError when every configuration failed or exited without a result
+def portfolio_solve(configurations: List[tuple[Problem, bool]], n: int, grid: Grid,
+                    timeout: Optional[float] = None) -> tuple[Optional[int], Optional[dict], int]:
+    results = multiprocessing.Queue()
+    processes = [multiprocessing.Process(target=race_worker, args=(index, problem, n, grid, forward_checking, results),
+                                         daemon=True)
+                 for index, (problem, forward_checking) in enumerate(configurations)]
+    for process in processes:
+        process.start()
+    deadline = time.monotonic() + timeout if timeout is not None else None
+    errors: Dict[int, str] = {}
+    try:
+        while len(errors) < len(processes):
+            wait_for = RACE_POLL_INTERVAL
+            if deadline is not None:
+                wait_for = min(wait_for, deadline - time.monotonic())
+                if wait_for <= 0:
+                    return None, None, 0
+            # checked before waiting, so a result put just before a worker exited is still read
+            exited = not any(process.is_alive() for process in processes)
+            try:
+                index, solution, nodes, error = results.get(timeout=wait_for)
+            except queue.Empty:
+                if exited:
+                    break
+                continue
+            if error is None:
+                return index, solution, nodes
+            errors[index] = error
+        failures = [errors.get(index, 'exited with code %s' % process.exitcode)
+                    for index, process in enumerate(processes)]
+        raise RuntimeError('Every configuration failed: ' +
+                           '; '.join('%d: %s' % (index, failure) for index, failure in enumerate(failures)))
+    finally:
+        for process in processes:
+            if process.is_alive():
+                process.terminate()
+            process.join()
+        results.close()
+        results.join_thread()
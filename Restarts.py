@@ -0,0 +1,85 @@
+import itertools
+import random
+from typing import Iterator, Optional
+
+from CSP import CSP, LimitReached, Problem, Grid
+
+
+# i-th term (from 1) of the Luby sequence 1, 1, 2, 1, 1, 2, 4, 1, 1, 2, 1, 1, 2, 4, 8, ...
+def luby(i: int) -> int:
+    k = 1
+    while (1 << k) - 1 < i:
+        k += 1
+    while i != (1 << k) - 1:
+        i -= (1 << (k - 1)) - 1
+        k = 1
+        while (1 << k) - 1 < i:
+            k += 1
+    return 1 << (k - 1)
+
+
+def luby_schedule(scale: int) -> Iterator[int]:
+    return (scale * luby(i) for i in itertools.count(1))
+
+
+def geometric_schedule(scale: int, factor: float = 1.5) -> Iterator[int]:
+    return (int(scale * factor ** i) for i in itertools.count())
+
+
+SCHEDULES = {'luby': luby_schedule, 'geometric': geometric_schedule}
+
+
+# Look for a first solution in runs of growing node budgets. Every run breaks ties
+# between variables and between values in a new random order drawn from seed, so the
+# whole sequence of runs is reproducible. Variables are picked with the CSP's ordering,
+# dom/wdeg if none is set; with carry_weights its constraint weights are kept from one
+# run to the next. A node limit, deadline and cancel token set on the CSP apply to the
+# whole sequence and end it with LimitReached, the node limit counting the nodes of all runs. Returns (solution or None when there is none, nodes
+# visited over all runs, number of runs, True unless max_runs ran out before the search
+# was decided)
+def restart_search(csp: CSP, assignment: dict, forward_checking=True, mac=False, LSC=False, seed=0,
+                   schedule='luby', scale=100, carry_weights=True,
+                   max_runs: Optional[int] = None) -> tuple[Optional[dict], int, int, bool]:
+    rng = random.Random(seed)
+    ordering = csp.ordering if csp.ordering is not None else csp.use_ordering('dom/wdeg')
+    root, propagate = csp.propagators(forward_checking, mac)
+    nodes, runs = 0, 0
+    max_nodes, deadline, cancel = csp.node_limit, csp.deadline, csp.cancel
+    csp.random = rng
+    try:
+        for budget in SCHEDULES[schedule](scale):
+            if max_runs is not None and runs == max_runs:
+                return None, nodes, runs, False
+            if max_nodes is not None:
+                if nodes >= max_nodes:
+                    raise LimitReached('nodes')
+                budget = min(budget, max_nodes - nodes)
+            runs += 1
+            if not carry_weights:
+                ordering.forget()
+            ordering.shuffle(rng)
+            csp.nodes_visited = 0
+            csp.set_limits(budget, deadline, cancel)
+            try:
+                solution = next(csp.propagated_solutions(assignment, root, propagate, LSC=LSC), None)
+            except LimitReached as reached:
+                if reached.reason != 'nodes':
+                    raise
+                continue
+            finally:
+                nodes += csp.nodes_visited
+            return solution, nodes, runs, True
+    finally:
+        csp.random = None
+        csp.set_limits(max_nodes, deadline, cancel)
+
+
+# restart_search on a grid with the search options of problem
+def restart_solve(problem: Problem, n: int, grid: Grid, forward_checking: bool, seed=0, schedule='luby', scale=100,
+                  carry_weights=True, max_runs: Optional[int] = None) -> tuple[Optional[dict], int, int, bool]:
+    csp, assignment = problem.build(n, grid)
+    if not problem.prepare(csp, assignment):
+        return None, 0, 0, True
+    solution, nodes, runs, decided = restart_search(csp, assignment, forward_checking, problem.mac, problem.LSC,
+                                                    seed, schedule, scale, carry_weights, max_runs)
+    return (csp.label(solution) if solution is not None else None), nodes, runs, decided
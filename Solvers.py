@@ -0,0 +1,28 @@
+from Binary import Binary
+from Binary2 import Binary2
+from Futoshiki import Futoshiki
+
+# Problem models and search modes offered by the command line scripts
+
+# problem models for each kind of puzzle
+MODELS = {
+    'binary': {'Binary': Binary, 'Binary2': Binary2},
+    'futoshiki': {'Futoshiki': Futoshiki},
+}
+
+# search modes: name -> (forward_checking, problem options)
+SEARCHES = {
+    'BT': (False, {}),
+    'FC': (True, {}),
+    'FC-trail': (True, {'trail': True}),
+    'MAC': (True, {'mac': True}),
+}
+HEURISTICS = {
+    '': (False, False),
+    '+MRV': (True, False),
+    '+LSC': (False, True),
+    '+MRV+LSC': (True, True),
+}
+MODES = {search + heuristic: (forward_checking, dict(options, MRV=MRV, LSC=LSC))
+         for search, (forward_checking, options) in SEARCHES.items()
+         for heuristic, (MRV, LSC) in HEURISTICS.items()}
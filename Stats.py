@@ -0,0 +1,71 @@
+import json
+from typing import Callable, Dict, List, Optional
+
+
+# Counters collected by an instrumented CSP search. Depth is the number of variables
+# assigned before the node, start assignment included. A backtrack is a value taken back
+# without a solution below it: it failed a check, wiped out a domain or its subtree had
+# no solution. Values on the way to a solution and values abandoned when the search
+# stops early are not backtracks
+class SearchStats:
+    def __init__(self, on_assign: Optional[Callable] = None, on_backtrack: Optional[Callable] = None,
+                 on_solution: Optional[Callable] = None) -> None:
+        # per constraint class name
+        self.constraint_calls: Dict[str, int] = {}
+        self.constraint_failures: Dict[str, int] = {}
+        self.constraint_time: Dict[str, float] = {}
+        # per depth
+        self.nodes: List[int] = []
+        self.backtracks: List[int] = []
+        self.wipeouts = 0
+        self.solutions = 0
+        # optional callbacks: on_assign(variable, value, depth), on_backtrack(variable, depth),
+        # on_solution(assignment)
+        self.on_assign = on_assign
+        self.on_backtrack = on_backtrack
+        self.on_solution = on_solution
+
+    def checked(self, constraint, elapsed: float, satisfied: bool) -> None:
+        name = type(constraint).__name__
+        self.constraint_calls[name] = self.constraint_calls.get(name, 0) + 1
+        self.constraint_time[name] = self.constraint_time.get(name, 0.0) + elapsed
+        if not satisfied:
+            self.constraint_failures[name] = self.constraint_failures.get(name, 0) + 1
+
+    def assigned(self, variable, value, depth: int) -> None:
+        add_at(self.nodes, depth)
+        if self.on_assign is not None:
+            self.on_assign(variable, value, depth)
+
+    def backtracked(self, variable, depth: int) -> None:
+        add_at(self.backtracks, depth)
+        if self.on_backtrack is not None:
+            self.on_backtrack(variable, depth)
+
+    def wiped_out(self) -> None:
+        self.wipeouts += 1
+
+    def found(self, assignment: dict) -> None:
+        self.solutions += 1
+        if self.on_solution is not None:
+            self.on_solution(assignment)
+
+    def to_dict(self) -> dict:
+        return {
+            'constraints': {name: {'calls': calls, 'failures': self.constraint_failures.get(name, 0),
+                                   'time': self.constraint_time[name]}
+                            for name, calls in self.constraint_calls.items()},
+            'nodes_by_depth': self.nodes,
+            'backtracks_by_depth': self.backtracks,
+            'wipeouts': self.wipeouts,
+            'solutions': self.solutions,
+        }
+
+    def to_json(self, **kwargs) -> str:
+        return json.dumps(self.to_dict(), **kwargs)
+
+
+def add_at(histogram: List[int], index: int) -> None:
+    if index >= len(histogram):
+        histogram.extend([0] * (index + 1 - len(histogram)))
+    histogram[index] += 1
@@ -0,0 +1,35 @@
+from collections import OrderedDict
+from typing import Any, Callable, Hashable
+
+# Compiled models kept by default, one per (problem, size, options)
+TEMPLATE_CAPACITY = 16
+
+
+# Compiled models, the CSPs holding what every grid of a size has in common, kept by key
+# so each is built once and cloned for every grid. The least recently used model is
+# evicted once capacity is exceeded
+class TemplateCache:
+    def __init__(self, capacity: int = TEMPLATE_CAPACITY) -> None:
+        self.capacity = capacity
+        self.templates: OrderedDict[Hashable, Any] = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def __len__(self) -> int:
+        return len(self.templates)
+
+    # The model stored under key, compiled first when there is none
+    def get(self, key: Hashable, compile: Callable[[], Any]) -> Any:
+        if key in self.templates:
+            self.templates.move_to_end(key)
+            self.hits += 1
+            return self.templates[key]
+        self.misses += 1
+        template = compile()
+        self.templates[key] = template
+        if len(self.templates) > self.capacity:
+            self.templates.popitem(last=False)
+        return template
+
+    def clear(self) -> None:
+        self.templates.clear()
@@ -0,0 +1,140 @@
+import argparse
+import itertools
+import json
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, wait, FIRST_COMPLETED
+from typing import Iterable, Iterator, List
+
+from Corpus import Puzzle, iter_puzzles
+from CSP import LimitReached
+from Solvers import MODELS, SEARCHES
+
+# Tasks in flight per worker: enough to keep every worker busy while results are written
+TASKS_PER_WORKER = 2
+
+# Status of a puzzle whose search reached a limit, by LimitReached reason
+LIMIT_STATUS = {'deadline': 'timeout', 'nodes': 'node_limit', 'cancelled': 'cancelled'}
+
+
+# Rows of a solution as lists of ints, whichever model found it
+def solution_rows(model: str, n: int, solution: dict) -> List[List[int]]:
+    if model == 'Binary':
+        return [[int(cell) for cell in solution[i]] for i in range(n)]
+    return [[solution[(i, j)] for j in range(n)] for i in range(n)]
+
+
+# Solve one puzzle with the settings of the batch; returns its result record. The search
+# gives up after settings['timeout'] seconds or settings['max_nodes'] nodes. The timeout
+# counts from before the model is built, but building it and the preprocessing pass are
+# not interrupted: a puzzle whose build used up the time is a timeout without searching,
+# one whose preprocessing did stops at the first look at the clock in the search
+def solve_puzzle(puzzle: Puzzle, settings: dict) -> dict:
+    forward_checking, options = SEARCHES[settings['search']]
+    model = settings['binary_model'] if puzzle.kind == 'binary' else 'Futoshiki'
+    problem = MODELS[puzzle.kind][model](settings['MRV'], settings['LSC'], **options)
+    result = {'name': puzzle.name, 'kind': puzzle.kind, 'n': puzzle.n, 'model': model, 'status': 'unsolvable',
+              'solution': None, 'solutions': 0, 'nodes': 0, 'first_nodes': None, 'time_build': None,
+              'time_first': None, 'time_total': None}
+    csp = None
+    start = time.perf_counter()
+    deadline = time.monotonic() + settings['timeout'] if settings['timeout'] else None
+    try:
+        csp, assignment = problem.build(puzzle.n, puzzle.grid)
+        result['time_build'] = time.perf_counter() - start
+        csp.set_limits(settings['max_nodes'], deadline)
+        csp.check_limit()
+        for solution in problem.stream(csp, assignment, forward_checking, None if settings['all'] else 1):
+            result['solutions'] += 1
+            if result['solutions'] == 1:
+                result.update(status='solved', solution=solution_rows(model, puzzle.n, solution),
+                              first_nodes=csp.nodes_visited, time_first=time.perf_counter() - start)
+    except LimitReached as reached:
+        result['status'] = LIMIT_STATUS[reached.reason]
+    except Exception as error:
+        # one bad puzzle must not take the batch down
+        result.update(status='error', error='%s: %s' % (type(error).__name__, error))
+    result['nodes'] = csp.nodes_visited if csp is not None else 0
+    result['time_total'] = time.perf_counter() - start
+    return result
+
+
+def solve_chunk(chunk: List[Puzzle], settings: dict) -> List[dict]:
+    return [solve_puzzle(puzzle, settings) for puzzle in chunk]
+
+
+def chunked(puzzles: Iterable[Puzzle], size: int) -> Iterator[List[Puzzle]]:
+    puzzles = iter(puzzles)
+    while chunk := list(itertools.islice(puzzles, size)):
+        yield chunk
+
+
+# Solve puzzles on processes workers, chunk_size puzzles per task, and yield the results
+# in completion order. Puzzles are read only as tasks are handed out and at most
+# TASKS_PER_WORKER tasks per worker are in flight, so memory stays bounded however many
+# puzzles come in. A single process solves in this process
+def solve_all(puzzles: Iterable[Puzzle], settings: dict, processes: int = 1,
+              chunk_size: int = 1) -> Iterator[dict]:
+    tasks = chunked(puzzles, chunk_size)
+    if processes == 1:
+        for chunk in tasks:
+            yield from solve_chunk(chunk, settings)
+        return
+    with ProcessPoolExecutor(processes) as executor:
+        running = {executor.submit(solve_chunk, chunk, settings)
+                   for chunk in itertools.islice(tasks, TASKS_PER_WORKER * processes)}
+        while running:
+            done, running = wait(running, return_when=FIRST_COMPLETED)
+            for future in done:
+                chunk = next(tasks, None)
+                if chunk is not None:
+                    running.add(executor.submit(solve_chunk, chunk, settings))
+                yield from future.result()
+
+
+def run(args) -> int:
+    settings = {'search': args.search, 'MRV': args.mrv, 'LSC': args.lsc, 'binary_model': args.binary_model,
+                'timeout': args.timeout, 'max_nodes': args.max_nodes, 'all': args.all}
+    processes = args.processes or os.cpu_count() or 1
+    out = open(args.out, 'w') if args.out else sys.stdout
+    counts = dict.fromkeys(('solved', 'unsolvable', 'timeout', 'node_limit', 'error'), 0)
+    start = time.perf_counter()
+    try:
+        for result in solve_all(iter_puzzles(args.sources), settings, processes, args.chunk_size):
+            out.write(json.dumps(result) + '\n')
+            out.flush()
+            counts[result['status']] = counts.get(result['status'], 0) + 1
+    except (OSError, ValueError) as error:
+        print('batch: ' + str(error), file=sys.stderr)
+        return 1
+    finally:
+        if out is not sys.stdout:
+            out.close()
+    print(', '.join('%d %s' % (count, status) for status, count in counts.items())
+          + ' in %.2fs' % (time.perf_counter() - start), file=sys.stderr)
+    return 0
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description='Solve batches of Binary and Futoshiki puzzles, one JSON line '
+                                                 'per puzzle in completion order')
+    parser.add_argument('sources', nargs='+', help='puzzle files, corpora or directories of puzzle files')
+    parser.add_argument('--out', help='file for the results, standard output by default')
+    parser.add_argument('--processes', type=int, default=0, help='worker processes, one per CPU by default')
+    parser.add_argument('--chunk-size', type=int, default=1, help='puzzles handed to a worker at a time')
+    parser.add_argument('--timeout', type=float, help='seconds per puzzle before giving up')
+    parser.add_argument('--max-nodes', type=int, help='nodes per puzzle before giving up')
+    parser.add_argument('--search', choices=list(SEARCHES), default='FC-trail')
+    parser.add_argument('--mrv', action='store_true', help='minimum remaining values variable ordering')
+    parser.add_argument('--lsc', action='store_true', help='least constraining value ordering')
+    parser.add_argument('--binary-model', choices=list(MODELS['binary']), default='Binary2')
+    parser.add_argument('--all', action='store_true', help='count all solutions, not only find the first')
+    args = parser.parse_args(argv)
+    if args.processes < 0 or args.chunk_size < 1:
+        parser.error('--processes must be at least 0 and --chunk-size at least 1')
+    return run(args)
+
+
+if __name__ == '__main__':
+    sys.exit(main())
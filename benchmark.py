@@ -0,0 +1,211 @@
+import argparse
+import json
+import multiprocessing
+import os
+import platform
+import queue
+import statistics
+import sys
+import time
+import tracemalloc
+
+from Solvers import MODELS, MODES
+from utils import read_grid_from_file
+
+DATA_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'binary-futoshiki_dane_v1.0')
+
+# Seconds between two looks at whether an isolated run is still alive
+POLL_INTERVAL = 0.1
+
+
+# Every input file with its kind and size, e.g. ('futoshiki', 5, path)
+def list_inputs(data_dir: str = DATA_DIR):
+    inputs = []
+    for name in sorted(os.listdir(data_dir)):
+        kind, _, size = name.partition('_')
+        if kind in MODELS and size:
+            inputs.append((kind, int(size.split('x')[0]), os.path.join(data_dir, name)))
+    return sorted(inputs, key=lambda item: (item[0], item[1]))
+
+
+# One search run; returns solutions, nodes, nodes to first solution and timings
+def measure(model: str, kind: str, n: int, path: str, mode: str, first_only: bool, trace: bool) -> dict:
+    forward_checking, options = MODES[mode]
+    problem = MODELS[kind][model](**options)
+    grid = read_grid_from_file(path)
+    if trace:
+        tracemalloc.start()
+    start = time.perf_counter()
+    csp, assignment = problem.build(n, grid)
+    time_first, first_nodes, count = None, 0, 0
+    for _ in problem.stream(csp, assignment, forward_checking, 1 if first_only else None):
+        count += 1
+        if count == 1:
+            time_first = time.perf_counter() - start
+            first_nodes = csp.nodes_visited
+    result = {'solutions': count, 'nodes': csp.nodes_visited, 'first_nodes': first_nodes,
+              'time_first': time_first, 'time_total': time.perf_counter() - start}
+    if trace:
+        result['peak_memory'] = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+    return result
+
+
+def measure_worker(results, *args) -> None:
+    try:
+        results.put(measure(*args))
+    except Exception as error:
+        results.put({'error': '%s: %s' % (type(error).__name__, error)})
+
+
+# Run measure in a fresh process so a hopeless case can be stopped after timeout seconds.
+# Returns None on timeout and {'error': message} when the run failed or its process died
+def measure_isolated(timeout: float, *args) -> dict | None:
+    results = multiprocessing.Queue()
+    process = multiprocessing.Process(target=measure_worker, args=(results,) + args, daemon=True)
+    process.start()
+    deadline = time.monotonic() + timeout
+    try:
+        while True:
+            # checked before waiting, so a result put just before the process exited is still read
+            exitcode = process.exitcode
+            try:
+                return results.get(timeout=max(min(POLL_INTERVAL, deadline - time.monotonic()), 0))
+            except queue.Empty:
+                if exitcode is not None:
+                    return {'error': 'worker exited with code %d' % exitcode}
+                if time.monotonic() >= deadline:
+                    return None
+    finally:
+        if process.is_alive():
+            process.terminate()
+        process.join()
+
+
+def summary(values: list) -> dict:
+    return {'mean': statistics.mean(values), 'stdev': statistics.stdev(values) if len(values) > 1 else 0.0,
+            'runs': values}
+
+
+def run_case(model: str, kind: str, n: int, path: str, mode: str, repeat: int, first_only: bool,
+             timeout: float) -> dict:
+    case = {'model': model, 'file': os.path.basename(path), 'n': n, 'mode': mode, 'first_only': first_only}
+    runs = []
+    for _ in range(repeat):
+        run = measure_isolated(timeout, model, kind, n, path, mode, first_only, False)
+        if run is None:
+            case['status'] = 'timeout'
+            return case
+        if 'error' in run:
+            case.update(status='error', error=run['error'])
+            return case
+        runs.append(run)
+    traced = measure_isolated(timeout * 10, model, kind, n, path, mode, first_only, True)
+    case.update({
+        'status': 'ok',
+        'solutions': runs[0]['solutions'],
+        'nodes': runs[0]['nodes'],
+        'first_nodes': runs[0]['first_nodes'],
+        'time_first': summary([run['time_first'] for run in runs]) if runs[0]['solutions'] else None,
+        'time_total': summary([run['time_total'] for run in runs]),
+        'peak_memory': traced.get('peak_memory') if traced else None,
+    })
+    return case
+
+
+def run(args) -> int:
+    cases = []
+    for kind, n, path in list_inputs(args.data):
+        if args.max_n is not None and n > args.max_n:
+            continue
+        for model in MODELS[kind]:
+            if args.model and model not in args.model:
+                continue
+            for mode in MODES:
+                if args.mode and mode not in args.mode:
+                    continue
+                case = run_case(model, kind, n, path, mode, args.repeat, not args.all, args.timeout)
+                cases.append(case)
+                if case['status'] == 'ok':
+                    print('%-9s %-15s %-16s nodes %-9d total %.4fs' % (model, case['file'], mode, case['nodes'],
+                                                                      case['time_total']['mean']))
+                else:
+                    print('%-9s %-15s %-16s %s' % (model, case['file'], mode, case.get('error', case['status'])))
+    report = {
+        'meta': {'python': sys.version.split()[0], 'platform': platform.platform(), 'repeat': args.repeat,
+                 'first_only': not args.all, 'timeout': args.timeout,
+                 'date': time.strftime('%Y-%m-%dT%H:%M:%S')},
+        'results': cases,
+    }
+    with open(args.out, 'w') as file:
+        json.dump(report, file, indent=1)
+    print('Results written to ' + args.out)
+    return 0
+
+
+# Differences of one case against its baseline, empty when nothing regressed
+def regressions(base: dict, new: dict, tolerance: float) -> list:
+    if new['status'] != 'ok':
+        return [] if base['status'] != 'ok' else ['now times out' if new['status'] == 'timeout' else 'now fails']
+    if base['status'] != 'ok':
+        return []
+    found = []
+    if new['solutions'] != base['solutions']:
+        found.append('solutions %d -> %d' % (base['solutions'], new['solutions']))
+    if new['nodes'] > base['nodes']:
+        found.append('nodes %d -> %d' % (base['nodes'], new['nodes']))
+    old_time, new_time = base['time_total'], new['time_total']
+    # slower by more than the tolerance and by more than the noise of both measurements
+    noise = 2 * (old_time['stdev'] + new_time['stdev'])
+    if new_time['mean'] > old_time['mean'] * (1 + tolerance) and new_time['mean'] - old_time['mean'] > noise:
+        found.append('time %.4fs -> %.4fs' % (old_time['mean'], new_time['mean']))
+    if base['peak_memory'] and new['peak_memory'] and new['peak_memory'] > base['peak_memory'] * (1 + tolerance):
+        found.append('peak memory %d -> %d' % (base['peak_memory'], new['peak_memory']))
+    return found
+
+
+def compare(args) -> int:
+    with open(args.baseline) as file:
+        baseline = {(c['model'], c['file'], c['mode'], c['first_only']): c for c in json.load(file)['results']}
+    with open(args.results) as file:
+        results = json.load(file)['results']
+    failed = 0
+    for case in results:
+        base = baseline.get((case['model'], case['file'], case['mode'], case['first_only']))
+        if base is None:
+            continue
+        found = regressions(base, case, args.tolerance)
+        if found:
+            failed += 1
+            print('REGRESSION %-9s %-15s %-16s %s' % (case['model'], case['file'], case['mode'], ', '.join(found)))
+    print('%d of %d cases regressed' % (failed, len(results)))
+    return 1 if failed else 0
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description='Benchmark the CSP solvers on binary-futoshiki_dane_v1.0')
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    run_parser = commands.add_parser('run', help='run the benchmark and write the results as JSON')
+    run_parser.add_argument('--out', default='benchmark_results.json')
+    run_parser.add_argument('--data', default=DATA_DIR, help='directory with the input files')
+    run_parser.add_argument('--model', action='append', choices=['Binary', 'Binary2', 'Futoshiki'])
+    run_parser.add_argument('--mode', action='append', choices=list(MODES))
+    run_parser.add_argument('--max-n', type=int, help='skip boards larger than this, none by default')
+    run_parser.add_argument('--repeat', type=int, default=3)
+    run_parser.add_argument('--timeout', type=float, default=30.0, help='seconds per run before giving up')
+    run_parser.add_argument('--all', action='store_true', help='enumerate all solutions, not only the first')
+    run_parser.set_defaults(handler=run)
+
+    compare_parser = commands.add_parser('compare', help='flag regressions against a saved baseline')
+    compare_parser.add_argument('baseline')
+    compare_parser.add_argument('results')
+    compare_parser.add_argument('--tolerance', type=float, default=0.2, help='allowed relative slowdown')
+    compare_parser.set_defaults(handler=compare)
+
+    args = parser.parse_args(argv)
+    return args.handler(args)
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,82 @@
+import os
+import random
+from typing import List
+
+from CSP import Grid
+from Corpus import Puzzle, read_puzzle
+
+DATA_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'binary-futoshiki_dane_v1.0')
+
+# (forward checking, problem options) of every search mode
+MODES = {
+    'BT': (False, {}),
+    'FC': (True, {}),
+    'BT-trail': (False, {'trail': True}),
+    'FC-trail': (True, {'trail': True}),
+    'FC-bitset': (True, {'trail': True, 'bitset': True}),
+    'MAC': (True, {'mac': True}),
+    'MAC-preprocess': (True, {'mac': True, 'preprocess': True}),
+    'FC-preprocess': (True, {'trail': True, 'preprocess': True}),
+    'FC-dom/wdeg': (True, {'trail': True, 'ordering': 'dom/wdeg'}),
+    'FC-mrv-degree': (True, {'trail': True, 'ordering': 'mrv-degree'}),
+    'BT-iterative': (False, {'trail': True, 'iterative': True}),
+    'FC-iterative': (True, {'trail': True, 'iterative': True}),
+    'MAC-iterative': (True, {'mac': True, 'iterative': True}),
+    'CBJ': (False, {'cbj': True}),
+    'CBJ-FC': (True, {'cbj': True}),
+    'CBJ-nogoods': (False, {'cbj': True, 'nogoods': 50}),
+    'CBJ-FC-nogoods': (True, {'cbj': True, 'nogoods': 50}),
+}
+# Names of the conflict-directed backjumping modes
+CBJ_MODES = [mode for mode in MODES if mode.startswith('CBJ')]
+# (MRV, LSC) of every heuristic combination
+HEURISTICS = [(False, False), (True, False), (False, True), (True, True)]
+
+# An empty 4x4 Futoshiki grid, solved by every Latin square of order 4
+EMPTY_4 = [['x', '-', 'x', '-', 'x', '-', 'x'] if i % 2 == 0 else ['-'] * 4 for i in range(7)]
+
+
+# A puzzle of binary-futoshiki_dane_v1.0 by file name, e.g. 'futoshiki_5x5'
+def board(name: str) -> Puzzle:
+    return read_puzzle(os.path.join(DATA_DIR, name))
+
+
+# Binary grid with each cell given with probability givens
+def random_binary(n: int, rng: random.Random, givens: float = 0.2) -> Grid:
+    return [[rng.choice('01') if rng.random() < givens else 'x' for _ in range(n)] for _ in range(n)]
+
+
+# Futoshiki grid with each field given and each inequality slot filled with the given probabilities
+def random_futoshiki(n: int, rng: random.Random, givens: float = 0.15, relations: float = 0.3) -> Grid:
+    def relation() -> str:
+        return rng.choice('<>') if rng.random() < relations else '-'
+
+    grid: List[List[str]] = []
+    for i in range(n):
+        row = []
+        for j in range(n):
+            row.append(str(rng.randint(1, n)) if rng.random() < givens else 'x')
+            if j < n - 1:
+                row.append(relation())
+        grid.append(row)
+        if i < n - 1:
+            grid.append([relation() for _ in range(n)])
+    return grid
+
+
+# Solutions as a set of hashable solutions, whatever form the model gives them in
+def solution_set(solutions) -> set:
+    return {tuple(sorted(solution.items())) for solution in solutions}
+
+
+# Build the CSP of a grid and search it with the options of the problem; returns the CSP
+def searched_csp(problem, n: int, grid: Grid, forward_checking: bool, to_first_solution=False):
+    csp, assignment = problem.build(n, grid)
+    problem.search(csp, assignment, to_first_solution, forward_checking)
+    return csp
+
+
+# A solution keyed by the variables of csp again, whatever names it was given back under
+def unlabel(csp, solution: dict) -> dict:
+    variables = dict(zip(csp.labels or csp.variables, csp.variables))
+    return {variables[label]: value for label, value in solution.items()}
@@ -0,0 +1,51 @@
+import itertools
+import random
+
+from AllDifferent import AllDifferentConstraint, filter_bounds
+
+
+def random_domains(rng: random.Random) -> dict:
+    return {variable: sorted(rng.sample(range(1, 7), rng.randint(1, 4))) for variable in range(rng.randint(2, 5))}
+
+
+# Values of each domain that take part in some assignment of all different values
+def supported(domains: dict):
+    found = {variable: set() for variable in domains}
+    for values in itertools.product(*domains.values()):
+        if len(set(values)) == len(values):
+            for variable, value in zip(domains, values):
+                found[variable].add(value)
+    if not any(found.values()):
+        return None
+    return {variable: sorted(values) for variable, values in found.items()}
+
+
+def test_matching_filter_keeps_exactly_the_supported_values():
+    rng = random.Random(8)
+    for _ in range(300):
+        domains = random_domains(rng)
+        constraint = AllDifferentConstraint(list(domains))
+        filtered = constraint.filter_matching({variable: list(values) for variable, values in domains.items()})
+        expected = supported(domains)
+        if expected is None:
+            assert filtered is None, domains
+        else:
+            assert {variable: sorted(values) for variable, values in filtered.items()} == expected, domains
+
+
+def test_bounds_filter_keeps_every_supported_value():
+    rng = random.Random(9)
+    for _ in range(300):
+        domains = random_domains(rng)
+        filtered = filter_bounds({variable: list(values) for variable, values in domains.items()})
+        expected = supported(domains)
+        if filtered is None:
+            assert expected is None, domains
+        elif expected is not None:
+            assert all(set(expected[variable]) <= set(filtered[variable]) for variable in domains), domains
+
+
+def test_bounds_filter_removes_hall_intervals():
+    # x and y fill [1, 2], so z keeps only 3
+    assert filter_bounds({'x': [1, 2], 'y': [1, 2], 'z': [1, 2, 3]}) == {'x': [1, 2], 'y': [1, 2], 'z': [3]}
+    assert filter_bounds({'x': [1, 2], 'y': [1, 2], 'z': [1, 2]}) is None
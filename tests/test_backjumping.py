@@ -0,0 +1,41 @@
+import random
+
+import pytest
+
+from Binary import Binary
+from Binary2 import Binary2
+from Futoshiki import Futoshiki
+from tests.grids import CBJ_MODES, MODES, board, random_binary, random_futoshiki
+
+
+def count(problem_class, n, grid, forward_checking=False, **options) -> int:
+    return problem_class(**options).count_solutions(n, grid, forward_checking)[0]
+
+
+@pytest.mark.parametrize('problem_class, name', [(Binary, 'binary_6x6'), (Binary, 'binary_8x8'),
+                                                 (Binary2, 'binary_6x6'), (Futoshiki, 'futoshiki_5x5')])
+@pytest.mark.parametrize('mode', CBJ_MODES)
+def test_backjumping_counts_match_backtracking_on_boards(problem_class, name, mode):
+    puzzle = board(name)
+    forward_checking, options = MODES[mode]
+    expected = count(problem_class, puzzle.n, puzzle.grid)
+    assert count(problem_class, puzzle.n, puzzle.grid, forward_checking, **options) == expected
+
+
+@pytest.mark.parametrize('problem_class', [Binary, Binary2])
+def test_backjumping_counts_match_backtracking_on_random_binary_grids(problem_class):
+    rng = random.Random(3)
+    for _ in range(15):
+        grid = random_binary(6, rng, 0.3)
+        expected = count(problem_class, 6, grid)
+        for forward_checking, options in map(MODES.get, CBJ_MODES):
+            assert count(problem_class, 6, grid, forward_checking, **options) == expected, grid
+
+
+def test_backjumping_counts_match_backtracking_on_random_futoshiki_grids():
+    rng = random.Random(3)
+    for _ in range(15):
+        grid = random_futoshiki(4, rng)
+        expected = count(Futoshiki, 4, grid)
+        for forward_checking, options in map(MODES.get, CBJ_MODES):
+            assert count(Futoshiki, 4, grid, forward_checking, **options) == expected, grid
@@ -0,0 +1,36 @@
+import batch
+from Corpus import Puzzle
+from tests.grids import board
+
+SETTINGS = {'search': 'FC-trail', 'MRV': False, 'LSC': False, 'binary_model': 'Binary2', 'timeout': None,
+            'max_nodes': None, 'all': False}
+
+
+def test_solve_puzzle_finds_the_solution():
+    result = batch.solve_puzzle(board('futoshiki_5x5'), SETTINGS)
+    assert result['status'] == 'solved' and result['solutions'] == 1
+    assert result['nodes'] >= result['first_nodes'] > 0
+
+
+def test_a_bad_puzzle_is_reported_as_an_error():
+    result = batch.solve_puzzle(Puzzle('bad', 'futoshiki', 2, [list('q<x'), list('--'), list('x-x')]), SETTINGS)
+    assert result['status'] == 'error' and 'error' in result
+
+
+def test_workers_solve_every_puzzle():
+    puzzles = [board(name) for name in ('binary_4x4', 'binary_6x6', 'futoshiki_3x3', 'futoshiki_4x4')]
+    results = list(batch.solve_all(puzzles, SETTINGS, processes=2))
+    assert sorted(result['name'] for result in results) == sorted(puzzle.name for puzzle in puzzles)
+    assert all(result['status'] == 'solved' for result in results)
+
+
+def test_timeout_counts_the_build():
+    # the time is up before the build is done, so the search never starts
+    result = batch.solve_puzzle(board('futoshiki_7x7'), dict(SETTINGS, timeout=1e-9))
+    assert result['status'] == 'timeout' and result['nodes'] == 0
+    assert result['time_build'] is not None
+
+
+def test_node_limit_is_not_exceeded():
+    result = batch.solve_puzzle(board('futoshiki_7x7'), dict(SETTINGS, max_nodes=20, all=True))
+    assert result['status'] == 'node_limit' and result['nodes'] == 20
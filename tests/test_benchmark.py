@@ -0,0 +1,54 @@
+import argparse
+import json
+
+import benchmark
+from tests.grids import DATA_DIR
+
+
+def case(first_only: bool, nodes: int, mode='BT') -> dict:
+    return {'model': 'Futoshiki', 'file': 'futoshiki_4x4', 'n': 4, 'mode': mode, 'first_only': first_only,
+            'status': 'ok', 'solutions': 1, 'nodes': nodes, 'first_nodes': nodes,
+            'time_first': {'mean': 0.001, 'stdev': 0.0, 'runs': [0.001]},
+            'time_total': {'mean': 0.001, 'stdev': 0.0, 'runs': [0.001]}, 'peak_memory': 1000}
+
+
+def compare(tmp_path, base: list, new: list) -> int:
+    paths = []
+    for name, cases in (('base.json', base), ('new.json', new)):
+        path = tmp_path / name
+        path.write_text(json.dumps({'meta': {}, 'results': cases}))
+        paths.append(str(path))
+    return benchmark.compare(argparse.Namespace(baseline=paths[0], results=paths[1], tolerance=0.2))
+
+
+def test_compare_flags_more_nodes(tmp_path):
+    assert compare(tmp_path, [case(True, 100)], [case(True, 100)]) == 0
+    assert compare(tmp_path, [case(True, 100)], [case(True, 200)]) == 1
+
+
+def test_compare_keeps_first_solution_and_all_solution_runs_apart(tmp_path):
+    base = [case(True, 100), case(False, 900)]
+    assert compare(tmp_path, base, [case(False, 900)]) == 0
+    assert compare(tmp_path, [case(True, 100)], [case(False, 900)]) == 0
+
+
+def test_compare_flags_runs_that_now_time_out(tmp_path):
+    timed_out = dict(case(True, 100), status='timeout')
+    assert compare(tmp_path, [case(True, 100)], [timed_out]) == 1
+    assert compare(tmp_path, [timed_out], [timed_out]) == 0
+
+
+def test_failing_run_is_an_error_not_a_timeout():
+    run = benchmark.measure_isolated(30, 'Futoshiki', 'futoshiki', 4, '/nonexistent', 'BT', True, False)
+    assert 'FileNotFoundError' in run['error']
+
+
+def test_run_case_measures():
+    case = benchmark.run_case('Futoshiki', 'futoshiki', 4, DATA_DIR + '/futoshiki_4x4', 'FC-trail', 2, True, 30)
+    assert case['status'] == 'ok' and case['solutions'] == 1
+    assert len(case['time_total']['runs']) == 2 and case['peak_memory'] > 0
+
+
+def test_every_board_is_listed():
+    inputs = benchmark.list_inputs()
+    assert len(inputs) == 12 and inputs[0] == ('binary', 4, DATA_DIR + '/binary_4x4')
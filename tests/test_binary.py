@@ -0,0 +1,78 @@
+import itertools
+import os
+import random
+
+import pytest
+
+import Binary
+from Binary2 import Binary2
+from BinaryTransfer import TransferBinary
+from BinaryVector import VectorBinary
+from tests.grids import board, random_binary
+
+
+# Every balanced row without three equal digits in a row, by brute force
+def brute_force_rows(n: int) -> list:
+    rows = []
+    for row in itertools.product('01', repeat=n):
+        line = ''.join(row)
+        if line.count('0') == line.count('1') and '000' not in line and '111' not in line:
+            rows.append(row)
+    return rows
+
+
+@pytest.mark.parametrize('n', range(1, 15))
+def test_enumerated_rows_are_the_valid_rows(n):
+    assert list(Binary.enumerate_valid_rows(n)) == brute_force_rows(n)
+
+
+def test_row_table_is_read_back_from_disk(tmp_path, monkeypatch):
+    monkeypatch.setattr(Binary, 'ROWS_CACHE_DIR', str(tmp_path))
+    monkeypatch.setattr(Binary, '_valid_rows', {})
+    rows = Binary.valid_rows(8)
+    assert os.path.exists(os.path.join(str(tmp_path), 'rows_8'))
+    monkeypatch.setattr(Binary, '_valid_rows', {})
+    assert Binary.valid_rows(8) == rows == brute_force_rows(8)
+
+
+def test_possible_rows_keep_the_givens():
+    rng = random.Random(4)
+    for row in random_binary(10, rng, 0.3):
+        givens = [(i, digit) for i, digit in enumerate(row) if digit != 'x']
+        expected = [valid for valid in brute_force_rows(10) if all(valid[i] == digit for i, digit in givens)]
+        assert Binary.generate_possible(row) == expected
+
+
+@pytest.mark.parametrize('name', ['binary_4x4', 'binary_6x6', 'binary_8x8'])
+def test_boards_have_one_solution(name):
+    puzzle = board(name)
+    problem = Binary.Binary(False, False)
+    problem.solve(puzzle.n, puzzle.grid, False, True)
+    assert len(problem.solutions) == 1
+
+
+# Binary solutions as tuples of rows, the form every Binary model can be compared in
+def binary_rows(n, solution) -> tuple:
+    if (0, 0) in solution:
+        return tuple(tuple(str(solution[(i, j)]) for j in range(n)) for i in range(n))
+    return tuple(tuple(solution[i]) for i in range(n))
+
+
+@pytest.mark.parametrize('name', ['binary_4x4', 'binary_6x6', 'binary_8x8'])
+def test_binary_models_agree(name):
+    puzzle = board(name)
+    n, grid = puzzle.n, puzzle.grid
+    rows = {binary_rows(n, solution) for solution in Binary.Binary().iter_solutions(n, grid, True)}
+    assert {binary_rows(n, solution) for solution in Binary2(trail=True).iter_solutions(n, grid, True)} == rows
+    assert {binary_rows(n, solution) for solution in VectorBinary().iter_solutions(n, grid)} == rows
+    assert {binary_rows(n, solution) for solution in TransferBinary(n, grid).iter_solutions()} == rows
+
+
+def test_binary_solvers_agree_on_random_grids():
+    rng = random.Random(11)
+    for _ in range(10):
+        grid = random_binary(6, rng, 0.25)
+        expected = {binary_rows(6, solution) for solution in Binary.Binary(trail=True).iter_solutions(6, grid, True)}
+        assert {binary_rows(6, solution) for solution in VectorBinary().iter_solutions(6, grid)} == expected
+        assert {binary_rows(6, solution) for solution in TransferBinary(6, grid).iter_solutions()} == expected
+        assert TransferBinary(6, grid).count_relaxed() >= len(expected)
@@ -0,0 +1,26 @@
+import random
+
+import pytest
+
+from Binary2 import ColumnConstraint, RowConstraint, generate_lines
+
+
+# Assign and take back cells at random in one assignment dict, as a search does, and
+# compare the incremental check on every assignment with the full one
+@pytest.mark.parametrize('constraint_class', [RowConstraint, ColumnConstraint])
+def test_incremental_uniqueness_check_agrees_with_the_full_check(constraint_class):
+    n = 4
+    rows, columns = generate_lines(n)
+    fields = list(range(n * n))
+    constraint = constraint_class(list(fields), n, rows if constraint_class is RowConstraint else columns)
+    rng = random.Random(5)
+    assignment = {}
+    for _ in range(3000):
+        if assignment and rng.random() < 0.4:
+            del assignment[rng.choice(list(assignment))]
+            continue
+        field = rng.choice([field for field in fields if field not in assignment] or fields)
+        assignment[field] = rng.randint(0, 1)
+        assert constraint.satisfied_by(field, assignment) == constraint.satisfied(assignment), assignment
+        if not constraint.satisfied(assignment):
+            del assignment[field]
@@ -0,0 +1,69 @@
+import os
+
+import pytest
+
+import Checkpoint
+from Checkpoint import checkpointed_search
+from Futoshiki import Futoshiki
+from tests.grids import board
+
+FUTOSHIKI_6 = board('futoshiki_6x6')
+
+
+def test_checkpointed_search_resumes_where_it_stopped(tmp_path, monkeypatch):
+    path = str(tmp_path / 'search.ckpt')
+    problem = Futoshiki()
+    expected = list(Futoshiki(trail=True).iter_solutions(FUTOSHIKI_6.n, FUTOSHIKI_6.grid, True))
+
+    # interrupt the search right after its second checkpoint
+    saves = []
+    save = Checkpoint.save_checkpoint
+
+    def interrupted(*args):
+        save(*args)
+        saves.append(args)
+        if len(saves) == 2:
+            raise KeyboardInterrupt
+
+    monkeypatch.setattr(Checkpoint, 'save_checkpoint', interrupted)
+    with pytest.raises(KeyboardInterrupt):
+        checkpointed_search(problem, FUTOSHIKI_6.n, FUTOSHIKI_6.grid, True, path, every=500, keep_solutions=True)
+    assert os.path.exists(path)
+    monkeypatch.setattr(Checkpoint, 'save_checkpoint', save)
+
+    count, solutions, nodes = checkpointed_search(problem, FUTOSHIKI_6.n, FUTOSHIKI_6.grid, True, path, every=500,
+                                                  keep_solutions=True)
+    uninterrupted = checkpointed_search(problem, FUTOSHIKI_6.n, FUTOSHIKI_6.grid, True, str(tmp_path / 'other'),
+                                        every=500, keep_solutions=True)
+    assert (count, solutions, nodes) == uninterrupted
+    assert solutions == expected
+    assert not os.path.exists(path)
+
+
+def test_checkpoint_of_another_search_is_refused(tmp_path):
+    path = str(tmp_path / 'search.ckpt')
+    Checkpoint.save_checkpoint(path, {'version': Checkpoint.CHECKPOINT_VERSION, 'instance': None})
+    with pytest.raises(ValueError):
+        checkpointed_search(Futoshiki(), FUTOSHIKI_6.n, FUTOSHIKI_6.grid, True, path)
+
+
+def test_checkpoint_of_another_domain_store_is_refused(tmp_path, monkeypatch):
+    path = str(tmp_path / 'search.ckpt')
+    save = Checkpoint.save_checkpoint
+
+    def interrupted(*args):
+        save(*args)
+        raise KeyboardInterrupt
+
+    monkeypatch.setattr(Checkpoint, 'save_checkpoint', interrupted)
+    with pytest.raises(KeyboardInterrupt):
+        checkpointed_search(Futoshiki(trail=True, bitset=True), FUTOSHIKI_6.n, FUTOSHIKI_6.grid, True, path,
+                            every=500)
+    monkeypatch.setattr(Checkpoint, 'save_checkpoint', save)
+    with pytest.raises(ValueError):
+        checkpointed_search(Futoshiki(trail=True), FUTOSHIKI_6.n, FUTOSHIKI_6.grid, True, path, every=500)
+    with pytest.raises(ValueError):
+        checkpointed_search(Futoshiki(trail=True, bitset=True, alldifferent='regin'), FUTOSHIKI_6.n,
+                            FUTOSHIKI_6.grid, True, path, every=500)
+    assert checkpointed_search(Futoshiki(trail=True, bitset=True), FUTOSHIKI_6.n, FUTOSHIKI_6.grid, True, path,
+                               every=500)[0] == 1
@@ -0,0 +1,38 @@
+import random
+
+import pytest
+
+from Binary import Binary
+from Binary2 import Binary2
+from Futoshiki import Futoshiki
+from tests.grids import board, searched_csp, unlabel
+
+
+# satisfied_by(variable) checks only what variable can break, so on an assignment that is
+# consistent without variable the constraints of variable must agree with full checks of
+# every constraint
+@pytest.mark.parametrize('problem_class, name', [(Futoshiki, 'futoshiki_5x5'), (Binary, 'binary_8x8'),
+                                                 (Binary2, 'binary_6x6')])
+def test_incremental_checks_agree_with_full_checks(problem_class, name):
+    puzzle = board(name)
+    csp = searched_csp(problem_class(False, False), puzzle.n, puzzle.grid, True)
+    solution = unlabel(csp, csp.solutions[0][0])
+    rng = random.Random(5)
+    for _ in range(30):
+        partial = {variable: value for variable, value in solution.items() if rng.random() < 0.7}
+        for variable in csp.variables:
+            for value in csp.domains_copy[variable]:
+                assignment = dict(partial)
+                assignment[variable] = value
+                full = all(constraint.satisfied(assignment) for constraint in csp.constr_map_variable)
+                assert csp.consistent(variable, assignment) == full, (variable, value)
+
+
+@pytest.mark.parametrize('problem_class, name', [(Futoshiki, 'futoshiki_5x5'), (Binary2, 'binary_6x6')])
+def test_cells_are_numbered_and_solutions_keep_their_names(problem_class, name):
+    puzzle = board(name)
+    csp = searched_csp(problem_class(False, False), puzzle.n, puzzle.grid, True)
+    assert csp.variables == list(range(puzzle.n * puzzle.n))
+    (solution, _), = csp.solutions
+    assert sorted(solution) == [(i, j) for i in range(puzzle.n) for j in range(puzzle.n)]
+    assert not any(hasattr(constraint, '__dict__') for constraint in csp.constr_map_variable)
@@ -0,0 +1,94 @@
+import random
+
+import pytest
+
+from Corpus import (Puzzle, decode_grid, detect, encode_grid, is_corpus, iter_corpus, iter_puzzles, pack,
+                    read_dataset, unpack, write_corpus)
+from tests.grids import DATA_DIR, random_binary, random_futoshiki
+
+
+def dataset() -> list:
+    return list(read_dataset(DATA_DIR))
+
+
+def test_dataset_holds_every_board():
+    puzzles = dataset()
+    assert len(puzzles) == 12
+    assert {(puzzle.kind, puzzle.n) for puzzle in puzzles} == {
+        ('binary', n) for n in (4, 6, 8, 10, 12, 14)} | {('futoshiki', n) for n in range(3, 9)}
+
+
+def test_pack_round_trip():
+    codes = [random.Random(1).randrange(8) for _ in range(50)]
+    assert unpack(pack(codes, 3), len(codes), 3) == codes
+
+
+@pytest.mark.parametrize('binary', [False, True])
+def test_corpus_round_trip(tmp_path, binary):
+    puzzles = dataset()
+    path = str(tmp_path / 'corpus')
+    assert write_corpus(path, puzzles, binary) == len(puzzles)
+    assert is_corpus(path)
+    assert list(iter_corpus(path)) == puzzles
+
+
+def test_random_grids_round_trip():
+    rng = random.Random(2)
+    for n in range(2, 10):
+        grid = random_futoshiki(n, rng, 0.5, 0.5)
+        assert decode_grid('futoshiki', n, encode_grid('futoshiki', n, grid)) == grid
+    for n in (4, 6, 8, 14):
+        grid = random_binary(n, rng, 0.5)
+        assert decode_grid('binary', n, encode_grid('binary', n, grid)) == grid
+
+
+def test_detect():
+    assert detect([list('x1'), list('0x')]) == ('binary', 2)
+    assert detect([list('x<x'), list('--'), list('1-x')]) == ('futoshiki', 2)
+    with pytest.raises(ValueError):
+        detect([list('x1x'), list('0x')])
+
+
+def test_invalid_grids_are_rejected():
+    with pytest.raises(ValueError):
+        encode_grid('binary', 2, [list('x2'), list('0x')])
+    with pytest.raises(ValueError):
+        encode_grid('futoshiki', 2, [list('x<3'), list('--'), list('1-x')])
+
+
+def test_empty_corpus(tmp_path):
+    path = tmp_path / 'empty'
+    path.write_bytes(b'')
+    assert list(iter_corpus(str(path))) == []
+
+
+def test_text_records_must_match_their_header(tmp_path):
+    path = tmp_path / 'corpus'
+    path.write_text('# corpus 1\nbinary 4 wrong\nx1\n0x\n')
+    with pytest.raises(ValueError):
+        list(iter_corpus(str(path)))
+
+
+def test_truncated_binary_corpus(tmp_path):
+    path = str(tmp_path / 'corpus')
+    write_corpus(path, dataset()[:2], binary=True)
+    with open(path, 'rb') as file:
+        data = file.read()
+    with open(path, 'wb') as file:
+        file.write(data[:-3])
+    with pytest.raises(ValueError):
+        list(iter_corpus(path))
+
+
+
+def test_sources_can_be_mixed(tmp_path):
+    puzzles = dataset()
+    corpus = str(tmp_path / 'corpus')
+    write_corpus(corpus, [Puzzle('extra', 'binary', 2, [list('x1'), list('0x')])], binary=True)
+    single = str(tmp_path / 'futoshiki_2x2')
+    with open(single, 'w') as file:
+        file.write('x<x\n--\n1-x')
+    found = list(iter_puzzles([DATA_DIR, corpus, single]))
+    assert found[:len(puzzles)] == puzzles
+    assert [puzzle.name for puzzle in found[len(puzzles):]] == ['extra', 'futoshiki_2x2']
+    assert not is_corpus(single)
@@ -0,0 +1,68 @@
+import random
+
+import pytest
+
+from Binary import Binary
+from Domains import BitsetDomains, ListDomains
+from Futoshiki import Futoshiki
+from tests.grids import board
+
+
+def random_domains(rng: random.Random) -> dict:
+    return {variable: sorted(rng.sample(range(1, 10), rng.randint(1, 9))) for variable in range(12)}
+
+
+def contents(domains) -> dict:
+    return {variable: sorted(domains[variable]) for variable in domains}
+
+
+@pytest.mark.parametrize('store', [ListDomains, BitsetDomains])
+def test_store_operations(store):
+    rng = random.Random(6)
+    for _ in range(20):
+        initial = random_domains(rng)
+        domains = store({variable: list(values) for variable, values in initial.items()})
+        expected = {variable: list(values) for variable, values in initial.items()}
+        saved = {variable: domains.save(variable) for variable in domains}
+        for _ in range(30):
+            variable = rng.randrange(12)
+            value = rng.randint(1, 9)
+            assert domains.contains(variable, value) == (value in expected[variable])
+            domains.remove(variable, value)
+            expected[variable] = [x for x in expected[variable] if x != value]
+            assert domains.size(variable) == len(expected[variable])
+        assert contents(domains) == expected
+        kept = [x for x in initial[0] if x % 2]
+        domains[0] = kept
+        assert list(domains[0]) == kept
+        for variable, state in saved.items():
+            domains.load(variable, state)
+        assert contents(domains) == initial
+
+
+def test_bitset_domains_keep_the_order_of_the_values():
+    domains = BitsetDomains({'a': [('1', '0'), ('0', '1')], 'b': [('0', '1')]})
+    assert domains['a'] == (('1', '0'), ('0', '1')) and domains['b'] == (('0', '1'),)
+    domains['a'] = [('0', '1')]
+    assert domains.size('a') == 1 and not domains.contains('a', ('1', '0'))
+
+
+def test_bitset_entries_pair_values_with_their_bits():
+    domains = BitsetDomains({'a': [3, 1, 2]})
+    assert domains.entries(domains.full) == ((3, 1), (1, 2), (2, 4))
+    assert domains.entries(domains.masks['a'] & ~2) == ((3, 1), (2, 4))
+
+
+@pytest.mark.parametrize('name', ['futoshiki_7x7', 'binary_6x6'])
+@pytest.mark.parametrize('options', [{}, {'trail': True}, {'trail': True, 'LSC': True}, {'MRV': True, 'LSC': True}])
+def test_bitset_search_visits_the_nodes_of_the_list_search(name, options):
+    # the allowed masks prune exactly what the checks of each value would
+    puzzle = board(name)
+    problem_class = Futoshiki if name.startswith('futoshiki') else Binary
+    results = []
+    for bitset in (False, True):
+        problem = problem_class(bitset=bitset, **options)
+        csp, assignment = problem.build(puzzle.n, puzzle.grid)
+        result = problem.search(csp, assignment, False, True)
+        results.append((len(result.solutions), result.nodes_visited))
+    assert results[0] == results[1]
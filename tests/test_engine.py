@@ -0,0 +1,40 @@
+import pytest
+
+from Engine import IterativeSearch
+from Futoshiki import Futoshiki
+from tests.grids import board
+
+FUTOSHIKI_6 = board('futoshiki_6x6')
+
+
+def all_solutions(problem, puzzle, forward_checking=True) -> list:
+    return list(problem.iter_solutions(puzzle.n, puzzle.grid, forward_checking))
+
+
+@pytest.mark.parametrize('mac', [False, True])
+def test_iterative_search_pauses_and_resumes(mac):
+    problem = Futoshiki(trail=True)
+    csp, assignment = problem.build(FUTOSHIKI_6.n, FUTOSHIKI_6.grid)
+    search = IterativeSearch(csp, assignment, True, mac)
+    solutions, pauses = [], 0
+    while not search.done:
+        solution = search.run(max_nodes=50)
+        if solution is not None:
+            solutions.append(csp.label(solution))
+        elif not search.done:
+            pauses += 1
+    assert pauses > 0
+    assert solutions == all_solutions(Futoshiki(trail=True, mac=mac), FUTOSHIKI_6)
+    assert csp.trail == []
+
+
+
+def test_iterative_search_state_moves_to_another_csp():
+    problem = Futoshiki(trail=True)
+    csp, assignment = problem.build(FUTOSHIKI_6.n, FUTOSHIKI_6.grid)
+    search = IterativeSearch(csp, assignment, True)
+    assert search.run(max_nodes=100) is None and not search.done
+    other, other_assignment = problem.build(FUTOSHIKI_6.n, FUTOSHIKI_6.grid)
+    resumed = IterativeSearch(other, other_assignment, True)
+    resumed.load(search.save())
+    assert [other.label(solution) for solution in resumed] == all_solutions(Futoshiki(trail=True), FUTOSHIKI_6)
@@ -0,0 +1,131 @@
+import random
+import threading
+import time
+
+import pytest
+
+from CSP import LimitReached
+from Futoshiki import Futoshiki
+from Restarts import restart_search
+from tests.grids import MODES, board, random_futoshiki
+
+# One search mode of every node loop the limits are checked in
+LIMITED = ['BT', 'FC', 'FC-trail', 'MAC', 'CBJ', 'FC-iterative']
+
+
+def build(options=None, name='futoshiki_7x7'):
+    puzzle = board(name)
+    problem = Futoshiki(**(options or {}))
+    csp, assignment = problem.build(puzzle.n, puzzle.grid)
+    return problem, csp, assignment
+
+
+# An empty 7x7 Futoshiki grid: far too many solutions to count them all
+def build_endless(options=None):
+    problem = Futoshiki(**(options or {}))
+    csp, assignment = problem.build(7, random_futoshiki(7, random.Random(), 0, 0))
+    return problem, csp, assignment
+
+
+def domains(csp) -> dict:
+    return {variable: list(csp.domains[variable]) for variable in csp.variables}
+
+
+def test_search_without_limits_runs_to_the_end():
+    problem, csp, assignment = build(name='futoshiki_5x5')
+    result = problem.search(csp, assignment, False, True)
+    assert result.limit is None and not result.limit_reached
+    assert len(result.solutions) == 1 and result.nodes_visited == csp.nodes_visited
+
+
+@pytest.mark.parametrize('mode', LIMITED)
+def test_node_limit_stops_every_mode(mode):
+    forward_checking, options = MODES[mode]
+    problem, csp, assignment = build(options)
+    before = domains(csp)
+    csp.set_limits(max_nodes=300)
+    result = problem.search(csp, assignment, False, forward_checking)
+    assert result.limit == 'nodes' and result.limit_reached
+    assert result.solutions == [] and result.nodes_visited == 300
+    assert domains(csp) == before and csp.trail == []
+
+
+@pytest.mark.parametrize('MRV', [False, True])
+def test_legacy_forward_checking_stopped_anywhere_restores_the_domains(MRV):
+    problem, csp, assignment = build({'MRV': MRV})
+    before = domains(csp)
+    for max_nodes in range(1, 60):
+        csp.set_limits(max_nodes=max_nodes)
+        assert problem.search(csp, dict(assignment), True, True).limit == 'nodes'
+        assert domains(csp) == before, max_nodes
+    csp.set_limits()
+    assert len(problem.search(csp, dict(assignment), True, True).solutions) == 1
+
+
+@pytest.mark.parametrize('mode', LIMITED)
+def test_node_limit_is_never_exceeded_with_a_deadline(mode):
+    forward_checking, options = MODES[mode]
+    # the clock is looked at every LIMIT_CHECK_INTERVAL nodes, the cap still holds exactly
+    problem, csp, assignment = build_endless(options)
+    csp.set_limits(max_nodes=1000, deadline=time.monotonic() + 60)
+    result = problem.search(csp, assignment, False, forward_checking)
+    assert result.limit == 'nodes' and result.nodes_visited == 1000
+
+
+def test_limits_can_be_lifted():
+    problem, csp, assignment = build(name='futoshiki_5x5')
+    csp.set_limits(max_nodes=5)
+    assert problem.search(csp, assignment, True, True).limit == 'nodes'
+    csp.set_limits()
+    result = problem.search(csp, assignment, True, True)
+    assert result.limit is None and len(result.solutions) == 1
+
+
+def test_generators_raise_limit_reached():
+    problem, csp, assignment = build()
+    csp.set_limits(max_nodes=50)
+    with pytest.raises(LimitReached) as reached:
+        list(problem.stream(csp, assignment, True))
+    assert reached.value.reason == 'nodes'
+
+
+def test_passed_deadline_stops_the_search():
+    problem, csp, assignment = build_endless({'trail': True})
+    csp.set_limits(deadline=time.monotonic())
+    result = problem.search(csp, assignment, False, True)
+    assert result.limit == 'deadline'
+
+
+def test_cancel_from_another_thread():
+    problem, csp, assignment = build_endless({'trail': True})
+    cancel = threading.Event()
+    csp.set_limits(cancel=cancel)
+    timer = threading.Timer(0.1, cancel.set)
+    timer.start()
+    try:
+        result = problem.search(csp, assignment, False, True)
+    finally:
+        timer.cancel()
+    assert result.limit == 'cancelled'
+
+
+def test_restarts_keep_the_deadline():
+    # the first runs stop at their node budgets long before the first look at the clock
+    problem, csp, assignment = build({'trail': True}, 'futoshiki_8x8')
+    csp.set_limits(deadline=time.monotonic() - 1)
+    with pytest.raises(LimitReached) as reached:
+        restart_search(csp, assignment, scale=1)
+    assert reached.value.reason == 'deadline'
+    assert csp.node_limit is None
+
+
+@pytest.mark.parametrize('max_nodes', [1, 50, 150])
+def test_restarts_keep_the_node_limit_over_all_runs(max_nodes):
+    problem, csp, assignment = build_endless({'trail': True})
+    counted = []
+    csp.enable_stats(on_assign=lambda *args: counted.append(args))
+    csp.set_limits(max_nodes=max_nodes)
+    with pytest.raises(LimitReached) as reached:
+        restart_search(csp, assignment, scale=1)
+    assert reached.value.reason == 'nodes'
+    assert len(counted) == max_nodes and csp.node_limit == max_nodes
@@ -0,0 +1,41 @@
+import random
+
+import pytest
+
+from Binary import Binary
+from Binary2 import Binary2
+from Futoshiki import Futoshiki
+from tests.grids import board, searched_csp
+
+
+# Least constraining value order the plain way: for every value, count the values of the
+# unassigned neighbours that become inconsistent
+def reference_order(csp, variable, assignment, unassigned) -> list:
+    ruled_out = {}
+    for value in csp.domains[variable]:
+        ruled_out[value] = 0
+        for neighbour in csp.get_unassigned_from_constraints(variable, unassigned):
+            trial = dict(assignment)
+            trial[variable] = value
+            for other in csp.domains[neighbour]:
+                trial[neighbour] = other
+                if not csp.consistent(neighbour, trial):
+                    ruled_out[value] += 1
+    return sorted(ruled_out, key=ruled_out.get)
+
+
+@pytest.mark.parametrize('problem_class, name', [(Futoshiki, 'futoshiki_5x5'), (Binary, 'binary_8x8'),
+                                                 (Binary2, 'binary_6x6')])
+def test_value_order_matches_the_plain_count(problem_class, name):
+    puzzle = board(name)
+    csp = searched_csp(problem_class(), puzzle.n, puzzle.grid, False)
+    solution = csp.solutions[0][0]
+    rng = random.Random(10)
+    for _ in range(40):
+        assignment = {variable: value for variable, value in solution.items() if rng.random() < 0.5}
+        unassigned = [variable for variable in csp.variables if variable not in assignment]
+        for variable in rng.sample(unassigned, min(5, len(unassigned))):
+            expected = reference_order(csp, variable, assignment, unassigned)
+            assert list(csp.LSC(variable, assignment, unassigned)) == expected
+            # the second call comes from the cache
+            assert list(csp.LSC(variable, assignment, unassigned)) == expected
@@ -0,0 +1,34 @@
+from Nogoods import NogoodStore
+
+
+def test_match_needs_every_pair_of_the_nogood():
+    store = NogoodStore(10)
+    store.add(frozenset({(0, 1), (1, 2)}))
+    assert store.match(1, 2, {0: 1, 1: 2}) == frozenset({(0, 1), (1, 2)})
+    assert store.match(1, 2, {0: 3, 1: 2}) is None
+    assert store.match(1, 2, {1: 2}) is None
+    assert store.match(1, 3, {0: 1, 1: 3}) is None
+    assert store.hits == 1
+
+
+def test_adding_twice_keeps_one_copy():
+    store = NogoodStore(10)
+    store.add(frozenset({(0, 1)}))
+    store.add(frozenset({(0, 1)}))
+    assert len(store) == 1
+
+
+def test_least_recently_used_nogood_is_evicted():
+    store = NogoodStore(2)
+    first, second, third = frozenset({(0, 1)}), frozenset({(1, 1)}), frozenset({(2, 1)})
+    store.add(first)
+    store.add(second)
+    # a match makes first the most recently used
+    assert store.match(0, 1, {0: 1}) == first
+    store.add(third)
+    assert len(store) == 2
+    assert store.match(1, 1, {1: 1}) is None
+    assert store.match(0, 1, {0: 1}) == first
+    assert store.match(2, 1, {2: 1}) == third
+    # evicted nogoods leave nothing behind in the index
+    assert (1, 1) not in store.index
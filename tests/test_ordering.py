@@ -0,0 +1,37 @@
+import random
+
+import pytest
+
+from Futoshiki import Futoshiki
+from Ordering import ORDERINGS
+from tests.grids import board
+
+
+@pytest.mark.parametrize('name', list(ORDERINGS))
+def test_heap_picks_what_a_scan_picks(name):
+    puzzle = board('futoshiki_6x6')
+    csp, assignment = Futoshiki(trail=True).build(puzzle.n, puzzle.grid)
+    ordering = csp.use_ordering(name)
+    ordering.attach(assignment)
+    rng = random.Random(3)
+    for _ in range(20):
+        unassigned = [v for v in csp.variables if v not in assignment]
+        assert ordering.best() == ordering.select(unassigned)
+        variable = rng.choice(unassigned)
+        if csp.domains.size(variable) > 1:
+            csp.domains.remove(variable, csp.domains[variable][0])
+            ordering.changed(variable)
+        else:
+            assignment[variable] = csp.domains[variable][0]
+
+
+def test_failures_move_variables_ahead_under_dom_wdeg():
+    puzzle = board('futoshiki_6x6')
+    csp, assignment = Futoshiki(trail=True).build(puzzle.n, puzzle.grid)
+    ordering = csp.use_ordering('dom/wdeg')
+    ordering.attach(assignment)
+    last = [v for v in csp.variables if v not in assignment][-1]
+    constraint = csp.constraints[last][0]
+    for _ in range(100):
+        ordering.failed(constraint)
+    assert ordering.best() in csp.constr_map_variable[constraint]
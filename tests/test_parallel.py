@@ -0,0 +1,72 @@
+import os
+
+import pytest
+
+from Binary2 import Binary2
+from Futoshiki import Futoshiki
+from Parallel import default_portfolio, parallel_search, portfolio_solve
+from tests.grids import EMPTY_4, board
+
+FUTOSHIKI_6 = board('futoshiki_6x6')
+BINARY_6 = board('binary_6x6')
+
+
+def sorted_items(solution: dict) -> list:
+    return sorted(solution.items())
+
+
+def all_solutions(problem, n, grid, forward_checking=True) -> list:
+    return list(problem.iter_solutions(n, grid, forward_checking))
+
+
+@pytest.mark.parametrize('problem, forward_checking', [(Futoshiki(), True), (Futoshiki(mac=True), True),
+                                                       (Binary2(), False)])
+def test_parallel_search_finds_the_sequential_solutions(problem, forward_checking):
+    puzzle = FUTOSHIKI_6 if isinstance(problem, Futoshiki) else BINARY_6
+    expected = all_solutions(type(problem)(trail=True), puzzle.n, puzzle.grid, forward_checking)
+    count, solutions, nodes = parallel_search(problem, puzzle.n, puzzle.grid, forward_checking, processes=2)
+    # solutions come in completion order
+    assert count == len(expected) and sorted(map(sorted_items, solutions)) == sorted(map(sorted_items, expected))
+    assert nodes > 0
+
+
+@pytest.mark.parametrize('count_only', [False, True])
+def test_parallel_search_splits_a_grid_with_many_solutions(count_only):
+    expected = all_solutions(Futoshiki(trail=True), 4, EMPTY_4)
+    count, solutions, _ = parallel_search(Futoshiki(trail=True), 4, EMPTY_4, True, processes=3,
+                                          count_only=count_only)
+    assert count == len(expected) == 576
+    if count_only:
+        assert solutions == []
+    else:
+        assert sorted(map(sorted_items, solutions)) == sorted(map(sorted_items, expected))
+
+
+def test_portfolio_returns_a_solution():
+    configurations = default_portfolio(Futoshiki)
+    index, solution, nodes = portfolio_solve(configurations, FUTOSHIKI_6.n, FUTOSHIKI_6.grid, timeout=60)
+    assert index is not None and nodes > 0
+    assert [solution] == all_solutions(Futoshiki(trail=True), FUTOSHIKI_6.n, FUTOSHIKI_6.grid)
+
+
+def test_portfolio_reports_a_grid_without_solutions():
+    grid = [list('1>x'), list('--'), list('x-x')]
+    index, solution, _ = portfolio_solve(default_portfolio(Futoshiki), 2, grid, timeout=60)
+    assert index is not None and solution is None
+
+
+def test_portfolio_reports_when_every_configuration_fails():
+    grid = [list('q-x'), list('--'), list('x-x')]
+    with pytest.raises(RuntimeError, match='Every configuration failed'):
+        portfolio_solve(default_portfolio(Futoshiki)[:2], 2, grid, timeout=60)
+
+
+# A problem whose worker process dies before it can report anything
+class Crashing(Futoshiki):
+    def build(self, n, grid):
+        os._exit(3)
+
+
+def test_portfolio_does_not_wait_for_crashed_workers():
+    with pytest.raises(RuntimeError, match='exited with code 3'):
+        portfolio_solve([(Crashing(), False), (Crashing(), True)], FUTOSHIKI_6.n, FUTOSHIKI_6.grid)
@@ -0,0 +1,50 @@
+import itertools
+
+import pytest
+
+from Binary2 import Binary2
+from Futoshiki import Futoshiki
+from Restarts import geometric_schedule, luby, luby_schedule, restart_search, restart_solve
+from tests.grids import board
+
+
+def test_luby_sequence():
+    assert [luby(i) for i in range(1, 16)] == [1, 1, 2, 1, 1, 2, 4, 1, 1, 2, 1, 1, 2, 4, 8]
+
+
+def test_luby_schedule_is_scaled():
+    assert list(itertools.islice(luby_schedule(100), 7)) == [100, 100, 200, 100, 100, 200, 400]
+
+
+def test_geometric_schedule():
+    assert list(itertools.islice(geometric_schedule(100, 2), 4)) == [100, 200, 400, 800]
+
+
+@pytest.mark.parametrize('problem_class, name', [(Futoshiki, 'futoshiki_5x5'), (Binary2, 'binary_6x6')])
+@pytest.mark.parametrize('schedule', ['luby', 'geometric'])
+def test_restarts_find_the_solution(problem_class, name, schedule):
+    puzzle = board(name)
+    expected = next(problem_class(trail=True).iter_solutions(puzzle.n, puzzle.grid, True))
+    solution, nodes, runs, decided = restart_solve(problem_class(), puzzle.n, puzzle.grid, True, seed=5,
+                                                   schedule=schedule, scale=10)
+    assert decided and solution == expected
+    assert nodes > 0 and runs >= 1
+
+
+def test_restarts_are_reproducible_and_restore_the_csp():
+    puzzle = board('futoshiki_6x6')
+    results = []
+    for _ in range(2):
+        problem = Futoshiki()
+        csp, assignment = problem.build(puzzle.n, puzzle.grid)
+        before = {variable: list(csp.domains[variable]) for variable in csp.variables}
+        results.append(restart_search(csp, assignment, seed=3, scale=20))
+        assert {variable: list(csp.domains[variable]) for variable in csp.variables} == before
+        assert csp.random is None and csp.node_limit is None
+    assert results[0] == results[1]
+
+
+def test_max_runs_leaves_the_search_undecided():
+    puzzle = board('futoshiki_6x6')
+    solution, _, runs, decided = restart_solve(Futoshiki(), puzzle.n, puzzle.grid, True, scale=1, max_runs=2)
+    assert (solution, runs, decided) == (None, 2, False)
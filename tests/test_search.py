@@ -0,0 +1,138 @@
+import functools
+import random
+
+import pytest
+
+from Binary import Binary
+from Binary2 import Binary2
+from Futoshiki import Futoshiki
+from tests.grids import (EMPTY_4, HEURISTICS, MODES, board, random_binary, random_futoshiki, searched_csp,
+                         solution_set, unlabel)
+
+BOARDS = [(Futoshiki, 'futoshiki_3x3'), (Futoshiki, 'futoshiki_4x4'), (Futoshiki, 'futoshiki_5x5'),
+          (Binary, 'binary_4x4'), (Binary, 'binary_6x6'), (Binary, 'binary_8x8'),
+          (Binary2, 'binary_4x4'), (Binary2, 'binary_6x6')]
+
+
+def solve(problem_class, n, grid, mode, MRV=False, LSC=False, **extra) -> set:
+    forward_checking, options = MODES[mode]
+    problem = problem_class(MRV, LSC, **dict(options, **extra))
+    return solution_set(problem.iter_solutions(n, grid, forward_checking))
+
+
+@functools.lru_cache(maxsize=None)
+def expected_solutions(problem_class, name) -> frozenset:
+    puzzle = board(name)
+    return frozenset(solve(problem_class, puzzle.n, puzzle.grid, 'BT'))
+
+
+@pytest.mark.parametrize('problem_class, name', BOARDS)
+@pytest.mark.parametrize('mode', list(MODES))
+@pytest.mark.parametrize('MRV, LSC', HEURISTICS)
+def test_every_mode_finds_the_same_solutions_on_boards(problem_class, name, mode, MRV, LSC):
+    puzzle = board(name)
+    assert solve(problem_class, puzzle.n, puzzle.grid, mode, MRV, LSC) == expected_solutions(problem_class, name)
+
+
+def test_boards_have_one_solution():
+    for problem_class, name in BOARDS:
+        assert len(expected_solutions(problem_class, name)) == 1, name
+
+
+@pytest.mark.parametrize('mode', list(MODES))
+@pytest.mark.parametrize('MRV, LSC', HEURISTICS)
+def test_every_mode_counts_the_same_on_random_futoshiki_grids(mode, MRV, LSC):
+    rng = random.Random(7)
+    for _ in range(12):
+        grid = random_futoshiki(4, rng)
+        assert solve(Futoshiki, 4, grid, mode, MRV, LSC) == solve(Futoshiki, 4, grid, 'BT'), grid
+
+
+@pytest.mark.parametrize('problem_class', [Binary, Binary2])
+@pytest.mark.parametrize('mode', list(MODES))
+def test_every_mode_counts_the_same_on_random_binary_grids(problem_class, mode):
+    rng = random.Random(7)
+    for _ in range(8):
+        grid = random_binary(6, rng, 0.3)
+        expected = solve(problem_class, 6, grid, 'BT')
+        assert solve(problem_class, 6, grid, mode, True, True) == expected, grid
+
+
+# A grid whose second row cannot be completed: three zeros in a row
+DEAD_ROW = [['x'] * 4, ['0', '0', '0', 'x'], ['x'] * 4, ['x'] * 4]
+
+
+@pytest.mark.parametrize('problem_class', [Binary, Binary2])
+@pytest.mark.parametrize('mode', list(MODES))
+@pytest.mark.parametrize('MRV, LSC', HEURISTICS)
+def test_unsolvable_binary_grid_has_no_solution_in_any_mode(problem_class, mode, MRV, LSC):
+    assert solve(problem_class, 4, DEAD_ROW, mode, MRV, LSC) == set()
+
+
+def test_preprocessing_that_wipes_out_a_domain_yields_nothing():
+    rng = random.Random(1)
+    wiped = 0
+    for _ in range(40):
+        grid = random_futoshiki(4, rng, 0.2)
+        problem = Futoshiki(trail=True, preprocess=True)
+        csp, assignment = problem.build(4, grid)
+        if not problem.prepare(csp, assignment):
+            wiped += 1
+            assert solve(Futoshiki, 4, grid, 'FC-preprocess') == set()
+            assert solve(Futoshiki, 4, grid, 'BT') == set()
+    assert wiped
+
+
+@pytest.mark.parametrize('problem_class, name', BOARDS)
+@pytest.mark.parametrize('to_first_solution', [True, False])
+def test_trail_search_restores_the_domains(problem_class, name, to_first_solution):
+    puzzle = board(name)
+    csp = searched_csp(problem_class(True, False, trail=True), puzzle.n, puzzle.grid, True, to_first_solution)
+    assert csp.trail == [] and csp.domains == csp.domains_copy
+
+
+@pytest.mark.parametrize('problem_class, name', BOARDS)
+def test_preprocessing_keeps_the_solution_values(problem_class, name):
+    puzzle = board(name)
+    csp = searched_csp(problem_class(False, False, preprocess=True), puzzle.n, puzzle.grid, True)
+    (solution, _), = csp.solutions
+    assert all(value in csp.domains[variable] for variable, value in unlabel(csp, solution).items())
+
+
+@pytest.mark.parametrize('alldifferent', ['regin', 'bounds'])
+@pytest.mark.parametrize('mode', ['BT', 'FC-trail', 'MAC', 'MAC-preprocess'])
+@pytest.mark.parametrize('name', ['futoshiki_4x4', 'futoshiki_5x5'])
+def test_alldifferent_finds_the_same_solutions(name, mode, alldifferent):
+    puzzle = board(name)
+    found = solve(Futoshiki, puzzle.n, puzzle.grid, mode, alldifferent=alldifferent)
+    assert found == expected_solutions(Futoshiki, name)
+
+
+def test_first_solution_is_a_solution():
+    puzzle = board('futoshiki_5x5')
+    for mode in MODES:
+        problem = Futoshiki(True, True, **MODES[mode][1])
+        first = next(problem.iter_solutions(puzzle.n, puzzle.grid, MODES[mode][0], limit=1))
+        assert solution_set([first]) == expected_solutions(Futoshiki, 'futoshiki_5x5'), mode
+
+
+@pytest.mark.parametrize('mode', list(MODES))
+def test_count_solutions_counts_what_iter_solutions_yields(mode):
+    forward_checking, options = MODES[mode]
+    count, first, nodes = Futoshiki(**options).count_solutions(4, EMPTY_4, forward_checking)
+    assert count == len(solve(Futoshiki, 4, EMPTY_4, mode)) == 576
+    assert 0 < first <= nodes
+    assert Futoshiki(**options).count_solutions(4, EMPTY_4, forward_checking, limit=10)[0] == 10
+
+
+@pytest.mark.parametrize('mode', ['FC-trail', 'MAC'])
+def test_stopping_a_stream_early_restores_the_domains(mode):
+    puzzle = board('binary_6x6')
+    forward_checking, options = MODES[mode]
+    problem = Binary2(**options)
+    csp, assignment = problem.build(puzzle.n, puzzle.grid)
+    before = {variable: list(csp.domains[variable]) for variable in csp.variables}
+    solutions = problem.stream(csp, dict(assignment), forward_checking)
+    next(solutions)
+    solutions.close()
+    assert csp.trail == [] and {variable: list(csp.domains[variable]) for variable in csp.variables} == before
@@ -0,0 +1,54 @@
+import pytest
+
+from Futoshiki import Futoshiki
+from tests.grids import MODES, board
+
+PUZZLE = board('futoshiki_5x5')
+OPEN_CELLS = sum(row[::2].count('x') for row in PUZZLE.grid[::2])
+
+
+def search(forward_checking, options, to_first_solution, **callbacks):
+    problem = Futoshiki(**options)
+    csp, assignment = problem.build(PUZZLE.n, PUZZLE.grid)
+    stats = csp.enable_stats(**callbacks)
+    result = problem.search(csp, assignment, to_first_solution, forward_checking)
+    return csp, stats, result
+
+
+@pytest.mark.parametrize('mode', list(MODES))
+@pytest.mark.parametrize('to_first_solution', [True, False])
+def test_every_node_is_counted(mode, to_first_solution):
+    assigned = []
+    csp, stats, _ = search(*MODES[mode], to_first_solution, on_assign=lambda *args: assigned.append(args))
+    assert sum(stats.nodes) == csp.nodes_visited == len(assigned)
+    assert all(backtracks_at <= nodes_at for backtracks_at, nodes_at in zip(stats.backtracks, stats.nodes))
+    assert stats.solutions == len(csp.solutions) == 1
+
+
+@pytest.mark.parametrize('mode', list(MODES))
+@pytest.mark.parametrize('to_first_solution', [True, False])
+def test_only_values_off_the_solution_path_are_backtracks(mode, to_first_solution):
+    backtracks = []
+    _, stats, _ = search(*MODES[mode], to_first_solution,
+                         on_backtrack=lambda variable, depth: backtracks.append(depth))
+    # the grid has one solution, every other value tried was a dead end
+    assert sum(stats.nodes) - sum(stats.backtracks) == OPEN_CELLS
+    assert len(backtracks) == sum(stats.backtracks)
+
+
+def test_recursive_and_iterative_searches_count_alike():
+    _, recursive, _ = search(*MODES['FC-trail'], False)
+    _, iterative, _ = search(*MODES['FC-iterative'], False)
+    assert (recursive.nodes, recursive.backtracks, recursive.wipeouts) == \
+           (iterative.nodes, iterative.backtracks, iterative.wipeouts)
+
+
+def test_callbacks_and_export():
+    solutions = []
+    _, stats, result = search(True, {'trail': True}, True, on_solution=solutions.append)
+    assert stats.solutions == len(solutions) == 1
+    exported = stats.to_dict()
+    assert exported['nodes_by_depth'] == stats.nodes and exported['backtracks_by_depth'] == stats.backtracks
+    assert set(exported['constraints']) == {'RowsConstraint', 'ColumnsConstraint', 'FutoshikiConstraint'}
+    assert all(counters['calls'] >= counters['failures'] for counters in exported['constraints'].values())
+    assert result.stats is stats
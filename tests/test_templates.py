@@ -0,0 +1,84 @@
+from concurrent.futures import ThreadPoolExecutor
+import random
+
+import pytest
+
+from Binary import Binary
+from Binary2 import Binary2
+from Futoshiki import Futoshiki
+from Templates import TemplateCache
+from tests.grids import board, solution_set
+
+
+def test_least_recently_used_template_is_evicted():
+    cache = TemplateCache(2)
+    cache.get('a', lambda: 'A')
+    cache.get('b', lambda: 'B')
+    assert cache.get('a', lambda: 'other') == 'A'
+    cache.get('c', lambda: 'C')
+    assert len(cache) == 2 and cache.hits == 1 and cache.misses == 3
+    assert cache.get('b', lambda: 'compiled again') == 'compiled again'
+
+
+# A board with its givens dropped at random, so every variant keeps its solutions
+def loosened(grid, rng) -> list:
+    return [[cell if not cell.isdigit() or rng.random() < 0.5 else 'x' for cell in row] for row in grid]
+
+
+# Grids built from one compiled model must not see each other's constraints and givens
+@pytest.mark.parametrize('problem_class, name', [(Futoshiki, 'futoshiki_5x5'), (Binary, 'binary_6x6'),
+                                                 (Binary2, 'binary_6x6')])
+def test_grids_built_from_one_model_stay_apart(problem_class, name):
+    puzzle = board(name)
+    rng = random.Random(8)
+    grids = [puzzle.grid] + [loosened(puzzle.grid, rng) for _ in range(2)]
+    problem = problem_class(trail=True)
+    template = problem.template(puzzle.n)
+    constraints = len(template.constr_map_variable)
+    domains = {variable: list(template.domains[variable]) for variable in template.variables}
+    for grid in grids * 2:
+        expected = solution_set(problem_class(trail=True, bitset=True).iter_solutions(puzzle.n, grid, True))
+        assert solution_set(problem.iter_solutions(puzzle.n, grid, True)) == expected, grid
+    assert problem.template(puzzle.n) is template
+    assert len(template.constr_map_variable) == constraints
+    assert {variable: list(template.domains[variable]) for variable in template.variables} == domains
+
+
+@pytest.mark.parametrize('problem_class, options, name', [
+    (Binary2, {}, 'binary_6x6'),
+    (Futoshiki, {'mac': True, 'alldifferent': 'regin'}, 'futoshiki_5x5'),
+])
+def test_clones_of_a_template_search_side_by_side(problem_class, options, name):
+    puzzle = board(name)
+    problem = problem_class(**options)
+    expected = solution_set(problem_class().iter_solutions(puzzle.n, puzzle.grid, False))
+    searches = []
+    for _ in range(2):
+        csp, assignment = problem.build(puzzle.n, puzzle.grid)
+        searches.append(problem.stream(csp, assignment, True))
+    stateful = [constraint for constraint in problem.template(puzzle.n).constr_map_variable if constraint.stateful]
+    assert stateful
+    # one step of each search in turn, both see the state of their own constraints only
+    found = [set(), set()]
+    running = [True, True]
+    while any(running):
+        for i, search in enumerate(searches):
+            if running[i]:
+                solution = next(search, None)
+                if solution is None:
+                    running[i] = False
+                else:
+                    found[i] |= solution_set([solution])
+    assert found[0] == found[1] == expected
+    assert all(getattr(constraint, 'tracked', None) is None and not getattr(constraint, 'matching', None)
+               for constraint in stateful)
+
+
+def test_threads_share_a_template():
+    puzzle = board('binary_8x8')
+    problem = Binary2(trail=True)
+    expected = solution_set(Binary2().iter_solutions(puzzle.n, puzzle.grid, False))
+    with ThreadPoolExecutor(4) as executor:
+        runs = list(executor.map(lambda _: solution_set(problem.iter_solutions(puzzle.n, puzzle.grid, True)),
+                                 range(8)))
+    assert all(found == expected for found in runs)